@@ -1 +1 @@
-__all__ = ["analyze", "database_manager.py", "dataloader", "processing"]
\ No newline at end of file
+__all__ = ["analyze", "cli", "database_manager.py", "dataloader", "engine", "export", "field_cache", "incremental", "instrumentation", "pipeline", "processing", "progress", "scheduler", "streaming"]
\ No newline at end of file
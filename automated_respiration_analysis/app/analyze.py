@@ -1,85 +1,86 @@
 import pandas as pd
 from PyQt5.QtCore import QRunnable, QObject, pyqtSignal
-from app import dataloader, processing
-from app.database_manager import DatabaseManager
+from app import pipeline
+from app.database_manager import connect_managers
+from app.export import DatabaseIntervalSink, DatabaseSink, ParquetDatasetSink
 import os
+import threading
 import traceback
 
 class AnalysisWorker(QRunnable):
     class Signals(QObject):
+        started = pyqtSignal()
         finished = pyqtSignal()
+        cancelled = pyqtSignal() # Emitted instead of finished when the run was cancelled
         error = pyqtSignal(str)
-        progress = pyqtSignal(int)
+        progress = pyqtSignal(dict) # See app.progress.ProgressTracker.snapshot, at most 10 per second
         status = pyqtSignal(str)
-        results = pyqtSignal(pd.DataFrame)
+        results = pyqtSignal(pd.DataFrame) # One batch of rows at a time, as soon as it is written
+        timing = pyqtSignal(dict) # Per-stage timing report at the end of the run
 
-    def __init__(self, data_root, db_config):
+    def __init__(self, data_root, db_config, cache_dir=None, max_workers=None, chunk_size=1000, incremental=False,
+                 profile=None, dataset_dir=None, export_intervals=False, cancel_event=None):
         super().__init__()
         self.data_root = data_root
         self.db_config = db_config
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers # None: one worker process per CPU core
+        self.chunk_size = chunk_size # Rows per streamed batch / bulk upsert transaction
+        self.incremental = incremental # Only analyze fractions that are new or changed since the last run
+        self.profile = profile # "cprofile"/"tracemalloc" (default: RESPIRATION_PROFILE env var)
+        self.dataset_dir = dataset_dir # Also write a partitioned Parquet dataset (results/ and optionally intervals/)
+        self.export_intervals = export_intervals # Per-interval metrics into 'analysis_intervals' (and the dataset)
+        self.cancel_event = cancel_event or threading.Event() # set() stops the run between patients (see cancel())
         self.signals = self.Signals()
 
+    def cancel(self):
+        self.cancel_event.set()
+
     def run(self):
         try:
             print("Worker thread started.")
-            self.signals.status.emit("Starting analysis...")
-            
-            if not self.data_root.exists() or not self.data_root.is_dir():
-                raise FileNotFoundError(f"Data directory not found: {self.data_root}")
-
-            print("Loading patient data...")
-            self.signals.status.emit("Loading patient data...")
-            total_list = dataloader.patient_listing(self.data_root)
-            
-            if not total_list:
-                self.signals.error.emit("No patient data found in the selected directory.")
+            self.signals.started.emit()
+            if self.cancel_event.is_set(): # Cancelled while queued
+                self.signals.cancelled.emit()
                 return
+            db_managers = connect_managers(self.db_config, with_intervals=self.export_intervals)
+
+            def status(message):
+                print(message)
+                self.signals.status.emit(message)
+
+            try:
+                sinks = [DatabaseSink(db_managers[0], 'analysis_results', chunk_size=self.chunk_size)]
+                interval_sinks = [DatabaseIntervalSink(db_managers[1])] if self.export_intervals else []
+                if self.dataset_dir:
+                    sinks.append(ParquetDatasetSink(os.path.join(self.dataset_dir, "results")))
+                    if self.export_intervals:
+                        interval_sinks.append(ParquetDatasetSink(os.path.join(self.dataset_dir, "intervals"), kind="intervals"))
+                summary = pipeline.run_analysis(self.data_root, sinks,
+                                                max_workers=self.max_workers,
+                                                cache_dir=self.cache_dir,
+                                                batch_size=self.chunk_size,
+                                                incremental=self.incremental,
+                                                status_callback=status,
+                                                progress_callback=self.signals.progress.emit,
+                                                batch_callback=self.signals.results.emit,
+                                                timing_callback=self.signals.timing.emit,
+                                                profile=self.profile,
+                                                interval_sinks=interval_sinks,
+                                                cancel_event=self.cancel_event)
+            finally:
+                print(f"Connection pool: {db_managers[0].pool_stats()}")
+                for db_manager in db_managers:
+                    db_manager.close()
 
-            all_results = []
-            total_data_types = len(total_list)
-            
-            for i, data_type in enumerate(total_list):
-                patient_list = total_list[data_type]
-                
-                self.signals.status.emit(f"Processing data type: {data_type}")
-                
-                total_patients = len(patient_list)
-                for j, patient_path in enumerate(patient_list):
-                    self.signals.status.emit(f"Analyzing patient {j+1}/{total_patients} in {data_type}...")
-                    
-                    patient_results = processing.batch_processing([patient_path])
-                    
-                    for patient_id, fractions in patient_results.items():
-                        for fraction, metrics in fractions.items():
-                            all_results.append({
-                                'patient_id': patient_id.split(os.sep)[-1],
-                                'data_type': data_type,
-                                'fraction': fraction,
-                                'reproducibility': metrics[0],
-                                'lvl_mean': metrics[1],
-                                'lvl_std': metrics[2],
-                                'stability': metrics[3],
-                                'error_mean': metrics[4],
-                                'error_std': metrics[5]
-                            })
-                    
-                    progress_value = int(((i + 1) / total_data_types) * 100)
-                    self.signals.progress.emit(progress_value)
-            
-            df_results = pd.DataFrame(all_results)
-            print("Analysis complete. Attempting to save to database...")
-            self.signals.status.emit("Analysis complete. Saving to database...")
-            
-            db_manager = DatabaseManager(self.db_config)
-            db_manager.connect()
-            db_manager.insert_dataframe(df_results, 'analysis_results')
-            db_manager.close()
-            
-            print("Data successfully uploaded to the database.")
-            self.signals.status.emit("Data successfully uploaded to the database.")
-            
-            self.signals.results.emit(df_results)
-            self.signals.finished.emit()
+            print(f"Run summary: {summary}")
+            if summary['cancelled']:
+                self.signals.cancelled.emit()
+            elif not summary['complete']: # Some batches failed to reach a sink (reported as a failed job)
+                self.signals.error.emit(f"Only {summary['rows_written']} of {summary['fractions_analyzed']} results "
+                                        f"were written. Check the log and run the analysis again.")
+            else:
+                self.signals.finished.emit()
 
         except Exception as e:
             error_message = f"An error occurred: {e}\n{traceback.format_exc()}"
@@ -0,0 +1,123 @@
+"""
+Headless batch runner (no Qt), e.g. from cron:
+
+    python -m app.cli analyze --root /data/respiration --workers 32 --out results.parquet --db
+    python -m app.cli analyze --root /data/respiration --dataset /data/respiration_parquet --intervals
+
+Status lines go to stderr; a JSON summary of the run is printed to stdout.
+Exit code: 0 when every result was written, 1 otherwise (also when interrupted with Ctrl+C/SIGTERM).
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import traceback
+
+from app import pipeline
+from app.export import DatabaseIntervalSink, DatabaseSink, ParquetDatasetSink, file_sink
+from app.instrumentation import PROFILE_MODES
+
+def db_config_from_env():
+    return {
+        'host': os.getenv("DB_HOST", ""),
+        'user': os.getenv("DB_USER", ""),
+        'password': os.getenv("DB_PASSWORD", ""),
+        'database': os.getenv("DB_NAME", "")
+    }
+
+def status(message):
+    print(message, file=sys.stderr, flush=True)
+
+def analyze(args):
+    sinks, interval_sinks, db_managers = [], [], []
+    # Ctrl+C / SIGTERM: stop between patients and still write the finished results
+    cancel_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: cancel_event.set())
+    summary = {'status': 'error'}
+    try:
+        if args.db:
+            from app.database_manager import connect_managers # mysql-connector is only needed with --db
+
+            db_config = db_config_from_env()
+            if not all(db_config.values()):
+                raise ValueError("Set DB_HOST, DB_USER, DB_PASSWORD and DB_NAME to write to the database.")
+            db_managers = connect_managers(db_config, with_intervals=args.intervals)
+            sinks.append(DatabaseSink(db_managers[0], 'analysis_results', chunk_size=args.chunk_size))
+            if args.intervals:
+                interval_sinks.append(DatabaseIntervalSink(db_managers[1]))
+        for out_path in args.out:
+            sinks.append(file_sink(out_path))
+        if args.dataset:
+            sinks.append(ParquetDatasetSink(os.path.join(args.dataset, "results")))
+            if args.intervals:
+                interval_sinks.append(ParquetDatasetSink(os.path.join(args.dataset, "intervals"), kind="intervals"))
+        if args.intervals and not interval_sinks:
+            raise ValueError("--intervals requires --db and/or --dataset.")
+        if not sinks:
+            raise ValueError("Nothing to write: pass --db and/or --out.")
+
+        summary.update(pipeline.run_analysis(args.root, sinks,
+                                             max_workers=args.workers,
+                                             cache_dir=args.cache_dir,
+                                             batch_size=args.chunk_size,
+                                             incremental=args.incremental,
+                                             status_callback=status,
+                                             profile=args.profile,
+                                             scan_workers=args.scan_workers,
+                                             interval_sinks=interval_sinks,
+                                             cancel_event=cancel_event,
+                                             clear_cache=args.clear_cache))
+        if summary['cancelled']:
+            summary['status'] = 'cancelled'
+        else:
+            summary['status'] = 'ok' if summary['complete'] else 'incomplete'
+        summary['outputs'] = (["database"] if args.db else []) + args.out + ([args.dataset] if args.dataset else [])
+    except Exception as e:
+        status(traceback.format_exc())
+        summary['error'] = str(e)
+    finally:
+        # run_analysis closes the sinks itself; this covers a failure before it got to them (closing is idempotent)
+        for sink in sinks + interval_sinks:
+            sink.close()
+        for db_manager in db_managers:
+            db_manager.close()
+
+    print(json.dumps(summary))
+    return 0 if summary['status'] == 'ok' else 1
+
+def main(argv=None):
+    try:
+        from dotenv import load_dotenv # Same .env as the GUI, when python-dotenv is installed
+        load_dotenv()
+    except ImportError:
+        pass
+
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Respiration analysis batch runner")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    analyze_parser = subparsers.add_parser("analyze", help="Analyze every patient under a data root")
+    analyze_parser.add_argument('--root', required=True, help='Data root (data type -> patient -> fraction -> field files)')
+    analyze_parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per CPU core)')
+    analyze_parser.add_argument('--out', action='append', default=[], help='Output .csv or .parquet file (repeatable)')
+    analyze_parser.add_argument('--dataset', default=None, help='Partitioned Parquet dataset directory (results/, by data type and date)')
+    analyze_parser.add_argument('--intervals', action='store_true', help='Also write per-interval metrics (analysis_intervals table and/or <dataset>/intervals)')
+    analyze_parser.add_argument('--db', action='store_true', help='Upsert into MySQL (DB_HOST/DB_USER/DB_PASSWORD/DB_NAME)')
+    analyze_parser.add_argument('--incremental', action='store_true', help='Only analyze new or changed fractions')
+    analyze_parser.add_argument('--scan_workers', type=int, default=None, help='Directory scan threads (1: sequential)')
+    analyze_parser.add_argument('--cache_dir', default=None, help='Parsed-field cache directory (default: RESPIRATION_CACHE_DIR)')
+    analyze_parser.add_argument('--clear_cache', action='store_true',
+                                help='Empty the parsed-field cache before the run (unused bundles are pruned after every run, '
+                                     'see RESPIRATION_CACHE_MAX_AGE_DAYS / RESPIRATION_CACHE_MAX_MB)')
+    analyze_parser.add_argument('--chunk_size', type=int, default=1000, help='Rows per streamed batch / upsert transaction')
+    analyze_parser.add_argument('--profile', choices=PROFILE_MODES, default=None,
+                                help='Profile this process (default: RESPIRATION_PROFILE); use --workers 1 to profile the analysis itself')
+
+    args = parser.parse_args(argv)
+    if args.command == "analyze":
+        return analyze(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
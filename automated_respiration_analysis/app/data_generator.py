@@ -1,7 +1,31 @@
 import pathlib
 import random
+
+import numpy as np
 from datetime import datetime, timedelta
 
+def field_file_content(amplitude_rows, beam_rows):
+    """Field export layout: 4th THICK banner + 1st thin banner -> amplitude rows, 6th THICK banner -> beam rows"""
+    return f"""
+=================
+Session Information
+=================
+=================
+Amplitude Data
+=================
+-----------------
+Time\tAmplitude
+{amplitude_rows}
+
+=================
+Beam Data
+=================
+-----------------
+Time\tState
+{beam_rows}
+
+"""
+
 def generate_random_data(root_dir, num_patients):
     """
     Generates a sample data directory with random patient IDs and data
@@ -56,30 +80,59 @@ def generate_random_data(root_dir, num_patients):
                     beam_times.append(f"{end_time:.2f}\t0")
 
                 # Combine everything into the file content
-                content = f"""
-=================
-Session Information
-=================
------------------
-Amplitude Data
------------------
-=================
-Time\tAmplitude
------------------
-{"\n".join(amplitude_data)}
-
-=================
-Beam Data
-=================
------------------
-Time\tState
------------------
-{"\n".join(beam_times)}
-
-"""
+                content = field_file_content("\n".join(amplitude_data), "\n".join(beam_times))
                 field_path.write_text(content)
                 
     print(f"Generated {num_patients} patients with randomized data at: {root_path.resolve()}")
 
+def breathing_field(rng, num_samples, dt=0.015):
+    """
+    One field recording: a breathing trace (cm) with rate/depth variability, baseline drift and noise,
+    gated near exhale. Returns (amplitude rows, beam rows) as tab-separated text.
+    """
+    times = np.arange(num_samples) * dt
+    period = rng.uniform(3.0, 5.0) # seconds per breath
+    phase = 2 * np.pi * times / period + 0.5 * np.sin(2 * np.pi * times / rng.uniform(20, 60))
+    baseline, depth = rng.uniform(0.2, 0.8), rng.uniform(0.5, 1.5)
+    drift = rng.normal(0, 0.002) * times
+    amps = baseline + drift + 0.5 * depth * (1 - np.cos(phase)) + rng.normal(0, 0.02, num_samples)
+
+    # Beam on while the trace is inside the exhale gating window
+    gated = (amps < baseline + drift + 0.3 * depth).astype(np.int8)
+    edges = np.flatnonzero(np.diff(gated)) + 1
+    beam_indices = np.concatenate(([0] if gated[0] else [], edges, [num_samples - 1] if gated[-1] else [])).astype(int)
+    beam_states = gated[beam_indices].copy()
+    if gated[-1]:
+        beam_states[-1] = 0 # Beam off at the end of the recording
+
+    amplitude_rows = "\n".join(f"{t:.3f}\t{a:.4f}" for t, a in zip(times.tolist(), amps.tolist()))
+    beam_rows = "\n".join(f"{times[i]:.3f}\t{state}" for i, state in zip(beam_indices.tolist(), beam_states.tolist()))
+    return amplitude_rows, beam_rows
+
+def generate_archive(root_dir, num_patients, num_fractions=4, num_fields=4, samples_per_field=20000, seed=0,
+                     data_types=("STATIC", "ARC")):
+    """
+    Generates a production-scale synthetic archive (deterministic for a given seed).
+    20000 samples per field is 5 minutes of recording at 15 ms resolution.
+    """
+    root_path = pathlib.Path(root_dir)
+    rng = np.random.default_rng(seed)
+    first_date = datetime(2024, 1, 1)
+
+    for patient_num in range(num_patients):
+        data_type = data_types[patient_num % len(data_types)]
+        date_str = (first_date + timedelta(days=int(rng.integers(0, 365)))).strftime("%y%m%d")
+        patient_path = root_path / data_type / f"{10000 + patient_num}_{date_str}_{patient_num % 100:02d}"
+
+        for fraction_num in range(1, num_fractions + 1):
+            fraction_path = patient_path / str(fraction_num)
+            fraction_path.mkdir(parents=True, exist_ok=True)
+            for field_num in range(1, num_fields + 1):
+                content = field_file_content(*breathing_field(rng, samples_per_field))
+                (fraction_path / f"field{field_num}.txt").write_text(content)
+
+    print(f"Generated {num_patients} patients x {num_fractions} fractions x {num_fields} fields "
+          f"({samples_per_field} samples each) at: {root_path.resolve()}")
+
 if __name__ == "__main__":
     generate_random_data("./data", 5)
\ No newline at end of file
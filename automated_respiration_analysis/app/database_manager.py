@@ -1,17 +1,192 @@
 import mysql.connector
-from mysql.connector import errorcode
+from mysql.connector import errorcode, pooling
+import os
+import threading
+import time
 import traceback
 
+DEFAULT_POOL_SIZE = 5
+
+# Columns of 'analysis_results' (viewer order) and its primary key: one row per fraction
+RESULT_COLUMNS = ["patient_id", "data_type", "fraction", "date", "reproducibility", "lvl_mean", "lvl_std",
+                  "stability", "error_mean", "error_std"]
+RESULT_KEY = ["patient_id", "data_type", "fraction"]
+# Metrics are DOUBLE: a FLOAT column returns values that do not compare equal to themselves once sent back as
+# parameters, which breaks keyset pagination (fetch_results_page) on these columns
+METRIC_COLUMNS = ["reproducibility", "lvl_mean", "lvl_std", "stability", "error_mean", "error_std"]
+# Patient directories that are not named ID_yymmdd_NN have no date; NaN metrics are written as NULL
+NULLABLE_COLUMNS = {"date", *METRIC_COLUMNS}
+
+# Columns of 'analysis_intervals' (one row per beam-enabled interval) and its primary key
+INTERVAL_COLUMNS = ["patient_id", "data_type", "fraction", "field", "interval_no", "beam_on", "beam_off",
+                    "samples", "level", "error"]
+INTERVAL_KEY = ["patient_id", "data_type", "fraction", "field", "interval_no"]
+
+SCHEMA_VERSION = 2
+
+RESULTS_TABLE = """
+CREATE TABLE IF NOT EXISTS analysis_results (
+  patient_id VARCHAR(255) NOT NULL,
+  data_type VARCHAR(255) NOT NULL,
+  fraction SMALLINT NOT NULL,
+  date DATE NULL,
+  reproducibility DOUBLE,
+  lvl_mean DOUBLE,
+  lvl_std DOUBLE,
+  stability DOUBLE,
+  error_mean DOUBLE,
+  error_std DOUBLE,
+  PRIMARY KEY (patient_id, data_type, fraction),
+  INDEX idx_results_type_date (data_type, date),
+  INDEX idx_results_date (date)
+);
+"""
+
+INTERVALS_TABLE = """
+CREATE TABLE IF NOT EXISTS analysis_intervals (
+  patient_id VARCHAR(255) NOT NULL,
+  data_type VARCHAR(255) NOT NULL,
+  fraction SMALLINT NOT NULL,
+  field VARCHAR(255) NOT NULL,
+  interval_no INT NOT NULL,
+  beam_on DOUBLE,
+  beam_off DOUBLE,
+  samples INT,
+  level DOUBLE,
+  error DOUBLE,
+  PRIMARY KEY (patient_id, data_type, fraction, field, interval_no),
+  INDEX idx_intervals_type (data_type, fraction)
+);
+"""
+
+LEGACY_TABLE = "analysis_results_v1" # Version 1 rows that have no fraction, kept by the migration
+
+def _schema_count(view, condition):
+    """Query counting the INFORMATION_SCHEMA rows of 'analysis_results' that match `condition` (> 0: step already applied)"""
+    return (f"SELECT COUNT(*) FROM INFORMATION_SCHEMA.{view} "
+            f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'analysis_results' AND {condition}")
+
+# Version 1 -> 2: one row per fraction instead of per patient, dates, secondary indexes and DOUBLE metrics.
+# MySQL commits every ALTER on its own, so each step is (query that is > 0 once the step is applied, statement) and
+# is skipped when already applied: a migration interrupted half-way simply runs again. Steps without a query are
+# idempotent and always run.
+MIGRATION_V2 = [
+    (None, "UPDATE analysis_results SET data_type = '' WHERE data_type IS NULL"),
+    (None, "ALTER TABLE analysis_results MODIFY data_type VARCHAR(255) NOT NULL, "
+           + ", ".join(f"MODIFY {col} DOUBLE" for col in METRIC_COLUMNS)),
+    (_schema_count("COLUMNS", "COLUMN_NAME = 'fraction'"),
+     "ALTER TABLE analysis_results ADD COLUMN fraction SMALLINT NOT NULL DEFAULT 0 AFTER data_type"),
+    (_schema_count("COLUMNS", "COLUMN_NAME = 'date'"),
+     "ALTER TABLE analysis_results ADD COLUMN date DATE NULL AFTER fraction"),
+    # Version 1 rows hold one result per patient, without its fraction (backfilled as 0): they cannot be re-keyed,
+    # so they are moved to LEGACY_TABLE (same columns, still keyed by patient_id) and the next analysis writes
+    # per-fraction rows. INSERT IGNORE keeps the move resumable: nothing is deleted before it is archived.
+    (None, f"CREATE TABLE IF NOT EXISTS {LEGACY_TABLE} LIKE analysis_results"),
+    (None, f"INSERT IGNORE INTO {LEGACY_TABLE} SELECT * FROM analysis_results WHERE fraction = 0"),
+    (None, "DELETE FROM analysis_results WHERE fraction = 0"),
+    (_schema_count("STATISTICS", "INDEX_NAME = 'PRIMARY' AND COLUMN_NAME = 'fraction'"),
+     "ALTER TABLE analysis_results DROP PRIMARY KEY, ADD PRIMARY KEY (patient_id, data_type, fraction)"),
+    (_schema_count("STATISTICS", "INDEX_NAME = 'idx_results_type_date'"),
+     "ALTER TABLE analysis_results ADD INDEX idx_results_type_date (data_type, date)"),
+    (_schema_count("STATISTICS", "INDEX_NAME = 'idx_results_date'"),
+     "ALTER TABLE analysis_results ADD INDEX idx_results_date (date)"),
+    # Results were written rounded to 4 decimals: drop the FLOAT representation error
+    (None, "UPDATE analysis_results SET " + ", ".join(f"{col} = ROUND({col}, 4)" for col in METRIC_COLUMNS)),
+    (None, """UPDATE analysis_results
+         SET date = STR_TO_DATE(SUBSTRING_INDEX(SUBSTRING_INDEX(patient_id, '_', 2), '_', -1), '%y%m%d')
+         WHERE patient_id REGEXP '^[^_]+_[0-9]{6}_[^_]+$'""")
+]
+
+class ConnectionPool:
+    """
+    Process-wide MySQL connection pool (one per DB config), shared by every DatabaseManager.
+    Keeps counters for acquire wait times.
+    """
+    _pools = dict()
+    _lock = threading.Lock()
+
+    def __init__(self, config, pool_size, pool_name):
+        self.pool = pooling.MySQLConnectionPool(pool_name=pool_name, pool_size=pool_size, **config)
+        self.pool_size = pool_size
+        self.schema_ready = False
+        self.schema_lock = threading.Lock()
+        self.stats = {
+            'acquired': 0, 'wait_total': 0.0, 'wait_max': 0.0, 'timeouts': 0
+        }
+        self.stats_lock = threading.Lock()
+
+    @classmethod
+    def for_config(cls, config):
+        """Returns the pool of this DB config, creating it on first use"""
+        config = dict(config)
+        pool_size = int(config.pop('pool_size', None) or os.getenv("DB_POOL_SIZE", DEFAULT_POOL_SIZE))
+        key = tuple(sorted((k, str(v)) for k, v in config.items()))
+        with cls._lock:
+            if key not in cls._pools:
+                print(f"Creating database connection pool (size {pool_size})...")
+                cls._pools[key] = cls(config, pool_size, pool_name=f"respiration_{len(cls._pools)}")
+            return cls._pools[key]
+
+    @classmethod
+    def close_all(cls):
+        """Disconnects the idle connections of every pool (borrowed ones are returned by their DatabaseManager)"""
+        with cls._lock:
+            for pool in cls._pools.values():
+                pool.disconnect_idle()
+            cls._pools.clear()
+
+    def disconnect_idle(self):
+        for _ in range(self.pool_size):
+            try:
+                cnx = self.pool.get_connection()
+            except pooling.PoolError: # Exhausted: the remaining connections are borrowed
+                break
+            except mysql.connector.Error: # Stale connection that could not reconnect: already closed
+                continue
+            cnx.disconnect() # Forwarded to the MySQL connection (close() would return it to the pool)
+
+    def acquire(self, timeout=30.0):
+        """Borrows a connection, waiting up to `timeout` seconds while the pool is exhausted"""
+        start_time = time.perf_counter()
+        while True:
+            try:
+                cnx = self.pool.get_connection() # Reconnects stale connections
+                break
+            except pooling.PoolError:
+                if time.perf_counter() - start_time >= timeout:
+                    with self.stats_lock:
+                        self.stats['timeouts'] += 1
+                    raise
+                time.sleep(0.01)
+
+        wait = time.perf_counter() - start_time
+        with self.stats_lock:
+            self.stats['acquired'] += 1
+            self.stats['wait_total'] += wait
+            self.stats['wait_max'] = max(self.stats['wait_max'], wait)
+        return cnx
+
+    def snapshot(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['pool_size'] = self.pool_size
+        stats['wait_mean'] = stats['wait_total'] / stats['acquired'] if stats['acquired'] else 0.0
+        return stats
+
 class DatabaseManager:
     def __init__(self, config):
         self.config = config
+        self.pool = None
         self.cnx = None
 
     def connect(self):
         try:
-            self.cnx = mysql.connector.connect(**self.config)
+            self.pool = ConnectionPool.for_config(self.config)
+            self.cnx = self.pool.acquire()
             print("Database connection successful.")
-            self.create_results_table()
+            with self.pool.schema_lock:
+                if not self.pool.schema_ready: # DDL runs once per process
+                    self.pool.schema_ready = self.create_results_table()
             return True
         except mysql.connector.Error as err:
             if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
@@ -23,74 +198,188 @@ class DatabaseManager:
             return False
 
     def close(self):
-        if self.cnx and self.cnx.is_connected():
+        """Returns the connection to the shared pool"""
+        if self.cnx:
             self.cnx.close()
-            print("Database connection closed.")
+            self.cnx = None
+
+    def pool_stats(self):
+        return self.pool.snapshot() if self.pool else {}
 
     def create_results_table(self):
         """
-        Creates the 'analysis_results' table if it doesn't already exist.
+        Creates or migrates the 'analysis_results' and 'analysis_intervals' tables to SCHEMA_VERSION.
+        The version is recorded in the 'schema_version' table; a results table without one is version 1.
+        The version is only recorded once every step succeeded; the migration steps are skipped when already applied.
         """
         cursor = self.cnx.cursor()
-        table_description = """
-        CREATE TABLE IF NOT EXISTS analysis_results (
-          patient_id VARCHAR(255) NOT NULL,
-          data_type VARCHAR(255),
-          reproducibility FLOAT,
-          lvl_mean FLOAT,
-          lvl_std FLOAT,
-          stability FLOAT,
-          error_mean FLOAT,
-          error_std FLOAT,
-          PRIMARY KEY (patient_id)
-        );
-        """
         try:
-            print("Creating table 'analysis_results'...")
-            cursor.execute(table_description)
+            cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (version INT NOT NULL)")
+            cursor.execute("SELECT MAX(version) FROM schema_version")
+            version = cursor.fetchone()[0]
+            if version is None:
+                cursor.execute("SHOW TABLES LIKE 'analysis_results'")
+                version = 1 if cursor.fetchall() else 0
+
+            if version == 1:
+                print(f"Migrating table 'analysis_results' to schema version 2 (rows without a fraction are moved to '{LEGACY_TABLE}')...")
+                for applied_query, statement in MIGRATION_V2:
+                    if applied_query is not None:
+                        cursor.execute(applied_query)
+                        if cursor.fetchone()[0]:
+                            continue
+                    cursor.execute(statement)
+                    self.cnx.commit() # ALTERs commit implicitly anyway: keep every finished step
+            elif version == 0:
+                print("Creating table 'analysis_results'...")
+                cursor.execute(RESULTS_TABLE)
+            cursor.execute(INTERVALS_TABLE)
+
+            if version < SCHEMA_VERSION:
+                cursor.execute("DELETE FROM schema_version")
+                cursor.execute("INSERT INTO schema_version (version) VALUES (%s)", (SCHEMA_VERSION,))
+            self.cnx.commit()
+            return True
         except mysql.connector.Error as err:
             print(f"Failed to create table: {err}")
+            return False
         finally:
             cursor.close()
 
-    def insert_dataframe(self, df, table_name):
-        cursor = self.cnx.cursor()
+    def insert_dataframe(self, df, table_name, chunk_size=1000, key=RESULT_KEY):
+        """
+        Upserts the DataFrame in chunks of `chunk_size` rows (`key`: primary key columns of the table).
+        Each chunk is a single multi-row INSERT ... ON DUPLICATE KEY UPDATE (executemany) in its own transaction.
+        Returns the number of rows sent/affected, chunks committed and elapsed seconds.
+        """
+        stats = {'rows': 0, 'affected_rows': 0, 'chunks': 0, 'seconds': 0.0}
+        if df.empty:
+            return stats
 
         columns = ', '.join(df.columns)
         placeholders = ', '.join(['%s'] * len(df.columns))
         
         insert_query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
 
-        update_cols = [f"{col}=VALUES({col})" for col in df.columns if col != 'patient_id']
+        update_cols = [f"{col}=VALUES({col})" for col in df.columns if col not in key]
         on_duplicate_key_update = f"ON DUPLICATE KEY UPDATE {', '.join(update_cols)}"
         
         insert_query = f"{insert_query} {on_duplicate_key_update}"
 
+        # Plain Python values (the connector cannot convert numpy scalars or NaN)
+        records = list(zip(*(df[col].astype(object).where(df[col].notna(), None).tolist() for col in df.columns)))
+
+        cursor = self.cnx.cursor()
+        start_time = time.perf_counter()
         try:
-            print(f"Inserting {len(df)} records into '{table_name}'...")
-            for _, row in df.iterrows():
-                cursor.execute(insert_query, tuple(row))
-            self.cnx.commit()
+            print(f"Inserting {len(records)} records into '{table_name}' in chunks of {chunk_size}...")
+            for chunk_start in range(0, len(records), chunk_size):
+                chunk = records[chunk_start:chunk_start + chunk_size]
+                cursor.executemany(insert_query, chunk)
+                self.cnx.commit()
+                stats['rows'] += len(chunk)
+                stats['affected_rows'] += max(cursor.rowcount, 0)
+                stats['chunks'] += 1
             print("Data successfully inserted/updated.")
         except mysql.connector.Error as err:
             print(f"Failed to insert data: {err}")
             print(traceback.format_exc())
+            self.cnx.rollback() # Only the failing chunk, committed chunks are kept
+        finally:
+            cursor.close()
+            stats['seconds'] = time.perf_counter() - start_time
+            print(f"{stats['rows']}/{len(records)} records written in {stats['chunks']} chunks ({stats['seconds']:.2f} s).")
+
+        return stats
+
+    def replace_intervals(self, df, chunk_size=5000):
+        """
+        Writes per-interval metrics (INTERVAL_COLUMNS) of whole fractions: the previous intervals of these fractions
+        are deleted and the new ones bulk inserted, chunk by chunk, in a single transaction. Returns the rows written.
+        """
+        if df.empty:
+            return 0
+        fractions = list(df[['patient_id', 'data_type', 'fraction']].drop_duplicates().itertuples(index=False, name=None))
+        records = list(zip(*(df[col].tolist() for col in INTERVAL_COLUMNS)))
+        insert_query = (f"INSERT INTO analysis_intervals ({', '.join(INTERVAL_COLUMNS)}) "
+                        f"VALUES ({', '.join(['%s'] * len(INTERVAL_COLUMNS))})")
+
+        cursor = self.cnx.cursor()
+        try:
+            for chunk_start in range(0, len(fractions), chunk_size):
+                chunk = fractions[chunk_start:chunk_start + chunk_size]
+                cursor.execute("DELETE FROM analysis_intervals WHERE (patient_id, data_type, fraction) IN "
+                               f"({', '.join(['(%s, %s, %s)'] * len(chunk))})", [value for key in chunk for value in key])
+            for chunk_start in range(0, len(records), chunk_size):
+                cursor.executemany(insert_query, records[chunk_start:chunk_start + chunk_size])
+            self.cnx.commit()
+            return len(records)
+        except mysql.connector.Error as err:
+            print(f"Failed to write intervals: {err}")
             self.cnx.rollback()
+            raise
         finally:
             cursor.close()
 
-    def fetch_all_results(self):
+    def fetch_results_page(self, order_by="patient_id", descending=False, after=None, limit=200, search=None):
+        """
+        One page of 'analysis_results' with keyset pagination.
+        Rows are ordered by (order_by, primary key); `after` is that sort key of the last row already fetched.
+        `search` filters on patient_id/data_type. Sorting and filtering run in SQL.
+        """
+        if order_by not in RESULT_COLUMNS:
+            raise ValueError(f"Unknown column: {order_by}")
+        sort_key = [order_by] + [col for col in RESULT_KEY if col != order_by]
+        direction = "DESC" if descending else "ASC"
+
+        conditions, params = [], []
+        if search:
+            conditions.append("(patient_id LIKE %s OR data_type LIKE %s)")
+            params += [f"%{search}%", f"%{search}%"]
+        if after is not None:
+            # Row-value comparison lets MySQL seek on the index instead of skipping OFFSET rows
+            op = '<' if descending else '>'
+            if order_by in NULLABLE_COLUMNS and after[0] is None:
+                # NULLs sort first: continue within the NULL rows, then (ascending) every non-NULL row
+                key_cond = f"({', '.join(sort_key[1:])}) {op} ({', '.join(['%s'] * (len(sort_key) - 1))})"
+                condition = f"({order_by} IS NULL AND {key_cond})"
+                conditions.append(condition if descending else f"({order_by} IS NOT NULL OR {condition})")
+                params += list(after[1:])
+            else:
+                condition = f"({', '.join(sort_key)}) {op} ({', '.join(['%s'] * len(sort_key))})"
+                conditions.append(f"({condition} OR {order_by} IS NULL)" if descending and order_by in NULLABLE_COLUMNS
+                                  else condition)
+                params += list(after)
+
+        query = f"SELECT {', '.join(RESULT_COLUMNS)} FROM analysis_results"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {', '.join(f'{col} {direction}' for col in sort_key)} LIMIT %s"
+        params.append(limit)
+
         results = []
         cursor = self.cnx.cursor(dictionary=True)
-        query = "SELECT * FROM analysis_results"
-        
         try:
-            cursor.execute(query)
+            cursor.execute(query, tuple(params))
             results = cursor.fetchall()
-            print("Data successfully fetched from database.")
         except mysql.connector.Error as err:
             print(f"Failed to fetch data: {err}")
+            raise
         finally:
             cursor.close()
-        
-        return results
\ No newline at end of file
+
+        return results
+def connect_managers(config, with_intervals=False):
+    """
+    Connected DatabaseManagers for one analysis run: [results] or [results, intervals].
+    Results and intervals are written from different threads, each through its own connection.
+    Raises ConnectionError (after closing the ones already connected) when a connection fails.
+    """
+    db_managers = []
+    for _ in range(2 if with_intervals else 1):
+        db_managers.append(DatabaseManager(config))
+        if not db_managers[-1].connect():
+            for db_manager in db_managers:
+                db_manager.close()
+            raise ConnectionError("Failed to connect to the database. Please check your credentials.")
+    return db_managers
@@ -1,65 +1,201 @@
+import contextlib
+import mmap
+import os
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
+import numpy as np
+from app.instrumentation import timed
+
+def _subdirs(path):
+    """Subdirectory entries of path; DirEntry.is_dir() reuses the file type returned by the directory listing"""
+    with os.scandir(path) as entries:
+        return [entry for entry in entries if entry.is_dir()]
+
+def _datatype_patients(datatype_entry):
+    """{data type name: patient entries} of a data type directory"""
+    subdirs = _subdirs(datatype_entry.path)
+
+    if len(subdirs) == 1:
+        """Case 1: Most simple case"""
+        return {datatype_entry.name: subdirs}
+    if not any("education" in entry.name for entry in subdirs):
+        """Case 2: Multiple patients"""
+        return {datatype_entry.name: subdirs}
+    """Case 3: Training information included"""
+    return {
+        f"{datatype_entry.name}_trained": _subdirs(os.path.join(datatype_entry.path, "education")),
+        f"{datatype_entry.name}_untrained": _subdirs(os.path.join(datatype_entry.path, "non-education"))
+    }
+
+def _patient_entries(root):
+    patient_entries = dict()
+    for datatype_entry in _subdirs(root):
+        patient_entries.update(_datatype_patients(datatype_entry))
+    return patient_entries
+
 def patient_listing(root):
     """Data organization (Listing ALL patients in a dictionary)"""
-    patients_to_analyze = dict()
-    root_path = Path(root)
-
-    for datatype_path in root_path.iterdir():
-        if not datatype_path.is_dir():
-            continue
-
-        subdirs = [p for p in datatype_path.iterdir() if p.is_dir()]
-        
-        if len(subdirs) == 1:
-            """Case 1: Most simple case"""
-            patients_to_analyze[datatype_path.name] = subdirs
-        else:
-            if not any("education" in str(directory) for directory in subdirs):
-                """Case 2: Multiple patients"""
-                IDs = [p for p in datatype_path.iterdir() if p.is_dir()]
-                patients_to_analyze[datatype_path.name] = IDs
-            else:
-                """Case 3: Training information included"""
-                trained = datatype_path / "education"
-                untrained = datatype_path / "non-education"
-                trained_IDs = [p for p in trained.iterdir() if p.is_dir()]
-                untrained_IDs = [p for p in untrained.iterdir() if p.is_dir()]
-                patients_to_analyze[f"{datatype_path.name}_trained"] = trained_IDs
-                patients_to_analyze[f"{datatype_path.name}_untrained"] = untrained_IDs
-    return patients_to_analyze
-
-def read_field_data(field_path):
+    return {data_type: [Path(entry.path) for entry in entries]
+            for data_type, entries in _patient_entries(root).items()}
+
+def patient_date(patient_id):
+    """Date of a patient directory named ID_yymmdd_NN (None if the name does not follow that pattern)"""
+    parts = patient_id.split("_")
+    if len(parts) != 3:
+        return None
+    try:
+        return datetime.strptime(parts[1], "%y%m%d").date()
+    except ValueError:
+        return None
+
+def _scan_patient(patient_path):
+    """{fraction path: [(field path, mtime_ns, size)]} of a patient, fractions in treatment order, fields in name order"""
+    fractions = dict()
+    for fx_entry in sorted(_subdirs(patient_path), key=lambda entry: int(entry.name)):
+        with os.scandir(fx_entry.path) as entries:
+            field_entries = sorted((entry for entry in entries if entry.is_file()), key=lambda entry: entry.name)
+        fields = []
+        for entry in field_entries:
+            stat = entry.stat()
+            fields.append((Path(entry.path), stat.st_mtime_ns, stat.st_size))
+        fractions[Path(fx_entry.path)] = fields
+    return fractions
+
+def scan_archive(root, max_workers=None):
+    """
+    Single-pass scan of the whole archive: {data type: {patient path: {fraction path: [(field path, mtime_ns, size)]}}}.
+    Every directory is listed once with os.scandir; field files are stat'ed once (the stat doubles as cache key).
+    Patients are scanned on a thread pool of max_workers threads (1: sequential), which hides network share latency.
+    """
+    patient_entries = _patient_entries(root)
+    patient_paths = [Path(entry.path) for entries in patient_entries.values() for entry in entries]
+
+    if max_workers == 1:
+        scanned = [_scan_patient(patient_path) for patient_path in patient_paths]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            scanned = list(executor.map(_scan_patient, patient_paths))
+
+    scanned = iter(scanned)
+    return {data_type: {Path(entry.path): next(scanned) for entry in entries}
+            for data_type, entries in patient_entries.items()}
+
+THICK_MARKER = b"============="
+THIN_MARKER = b"-------------"
+
+def _marker_lines(buffer, marker, end=None):
+    """Yields the offset of every line containing the banner marker"""
+    end = len(buffer) if end is None else end
+    pos = buffer.find(marker, 0, end)
+    while pos >= 0:
+        yield buffer.rfind(b"\n", 0, pos) + 1
+        pos = buffer.find(b"\n", pos)
+        if pos < 0:
+            return
+        pos = buffer.find(marker, pos, end)
+
+def _nth_marker_line(buffer, marker, n):
+    """Offset of the n-th line containing the banner marker (-1 if missing)"""
+    for count, line_start in enumerate(_marker_lines(buffer, marker), start=1):
+        if count == n:
+            return line_start
+    return -1
+
+def _line_end(buffer, pos, end):
+    """Offset of the line following the one at pos (end if it is the last line)"""
+    newline = buffer.find(b"\n", pos, end)
+    return end if newline < 0 else newline + 1
+
+def _blank_line(buffer, start):
+    """Offset of the newline ending the last row before the next blank line (LF or CRLF), -1 if none"""
+    ends = [pos for pos in (buffer.find(b"\n\n", start), buffer.find(b"\n\r\n", start)) if pos >= 0]
+    return min(ends) if ends else -1
+
+def _section_blocks(buffer, start, end, header):
+    """
+    Row blocks of a section spanning [start, end): every line containing header starts a block
+    that runs up to the next blank line (or the end of the section)
+    """
+    blocks = []
+    pos = start
+    while 0 <= pos < end:
+        header_pos = buffer.find(header, pos, end)
+        if header_pos < 0:
+            break
+        row_start = _line_end(buffer, header_pos, end)
+        blank = _blank_line(buffer, row_start - 1)
+        row_end = end if blank < 0 or blank + 1 > end else max(blank + 1, row_start)
+        blocks.append(buffer[row_start:row_end])
+        pos = _line_end(buffer, row_end, end)
+    return blocks
+
+def _decode_rows(rows):
+    """
+    Decodes a block of "time<TAB>value" rows straight into a (N, 2) float64 array.
+    Rows without exactly one tab and two numbers raise ValueError, like float() does in the line-by-line reader.
+    """
+    if not rows:
+        return np.empty((0, 2), dtype=np.float64)
+    raw = np.frombuffer(rows, dtype=np.uint8)
+    newlines = np.flatnonzero(raw == ord("\n"))
+    num_rows = len(newlines) + (raw[-1] != ord("\n"))
+    tabs_per_row = np.bincount(np.searchsorted(newlines, np.flatnonzero(raw == ord("\t"))), minlength=num_rows)
+    bad_rows = np.flatnonzero(tabs_per_row != 1)
+    if len(bad_rows):
+        raise ValueError(f"Malformed row {bad_rows[0] + 1}: expected 'time<TAB>value'")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning) # Older numpy only warns (and stops) on unparsable text
+        try:
+            values = np.fromstring(rows, dtype=np.float64, sep=" ")
+        except (ValueError, DeprecationWarning) as e:
+            raise ValueError(f"Malformed rows: {e}") from None
+    if len(values) != 2 * num_rows:
+        raise ValueError("Malformed rows: expected two numbers per row")
+    return values.reshape(-1, 2)
+
+def read_field_data(field_path, timer=None):
     """How to read a field-data (all data are field-data)"""
     """Multiple fields are applied to the patients in each fraction"""
-    data_Times, data_Amps = [], []
-    beam_Times, beam_States = [], []
-    THICK_cnt, thin_cnt = 0, 0
-    data_flag, beam_flag  = False, False
-
-    with open(field_path, "r") as file: # Open file
-        for line in file:
-            if "=============" in line:
-                THICK_cnt += 1
-            if "-------------" in line:
-                thin_cnt += 1
-            
-            ### Read time-data
-            if (THICK_cnt >= 4) and (thin_cnt == 1):
-                if data_flag and line == "\n": data_flag = False
-                if data_flag:
-                    time, amplitude = line.strip().split("\t")
-                    data_Times.append(float(time))
-                    data_Amps.append(float(amplitude) * 10.0) # cm to mm
-                if (THICK_cnt >= 4 and thin_cnt <= 1) and ("Amplitude" in line): data_flag = True
-            
-            ### Read beam-data
-            if (THICK_cnt >= 6):
-                if beam_flag and line == "\n": break
-                elif beam_flag:
-                    time, state = line.strip().split("\t")
-                    beam_Times.append(float(time))
-                    beam_States.append(int(state))
-                elif ("Time" in line): beam_flag = True
-
-    return (data_Times, data_Amps), (beam_Times, beam_States)
\ No newline at end of file
+    with contextlib.ExitStack() as stack: # Closes the map and the file even if mapping or parsing fails
+        with timed(timer, "file_io"):
+            file = stack.enter_context(open(field_path, "rb")) # Open file
+            size = os.fstat(file.fileno()).st_size
+            # Memory-mapped: only the two numeric sections are ever copied out of the page cache (empty files cannot be mapped)
+            buffer = stack.enter_context(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)) if size else b""
+        if timer is not None:
+            timer.count("files_read")
+            timer.count("bytes_parsed", size)
+
+        with timed(timer, "parse"):
+            return parse_field_text(buffer)
+
+def parse_field_text(buffer):
+    """
+    Same sections as the line-by-line reader: amplitude rows follow an "Amplitude" line from the 4th THICK banner on,
+    while exactly one thin banner has been seen; beam rows follow the first "Time" line from the 6th THICK banner on.
+    `buffer` is the raw file content (bytes, mmap or str).
+    """
+    if isinstance(buffer, str):
+        buffer = buffer.encode()
+
+    ### Read time-data
+    thick_4, thin_1, thin_2 = (_nth_marker_line(buffer, THICK_MARKER, 4), _nth_marker_line(buffer, THIN_MARKER, 1),
+                               _nth_marker_line(buffer, THIN_MARKER, 2))
+    data_blocks = []
+    if thick_4 >= 0 and thin_1 >= 0:
+        data_blocks = _section_blocks(buffer, max(thick_4, thin_1), len(buffer) if thin_2 < 0 else thin_2, b"Amplitude")
+    data = np.concatenate([_decode_rows(rows) for rows in data_blocks]) if data_blocks else _decode_rows(b"")
+    data_Times = np.ascontiguousarray(data[:, 0])
+    data_Amps = data[:, 1] * 10.0 # cm to mm
+
+    ### Read beam-data
+    beam_start = _nth_marker_line(buffer, THICK_MARKER, 6)
+    beam_blocks = _section_blocks(buffer, beam_start, len(buffer), b"Time")[:1] if beam_start >= 0 else []
+    beam = _decode_rows(beam_blocks[0] if beam_blocks else b"")
+    beam_Times = np.ascontiguousarray(beam[:, 0])
+    beam_States = beam[:, 1].astype(np.int8)
+
+    return (data_Times, data_Amps), (beam_Times, beam_States)
@@ -0,0 +1,204 @@
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from app import processing
+from app.field_cache import FieldCache
+from app.instrumentation import StageTimer
+from app.progress import ProgressTracker
+
+_process_caches = dict()
+
+def _field_cache(cache_dir):
+    """One FieldCache per worker process (reused across jobs)"""
+    if cache_dir not in _process_caches:
+        _process_caches[cache_dir] = FieldCache(cache_dir)
+    return _process_caches[cache_dir]
+
+def analyze_fractions(data_type, patient_path, fractions, cache_dir=None, with_intervals=False):
+    """
+    Job executed in a worker process: metrics rows of a patient's fractions [(fx_path, fields, fingerprint)],
+    computed in one cohort pass, the job's stage timings and, with_intervals, the table of per-interval metrics
+    """
+    timer = StageTimer()
+    cohort_series = processing.load_fractions(fractions, cache=_field_cache(cache_dir), timer=timer)
+    with timer.stage("metrics"):
+        stacked = processing.stack_intervals(cohort_series)
+        metrics = processing.reduce_cohort_metrics(stacked, len(fractions))
+    timer.count("intervals_processed", len(stacked['levels']))
+    timer.count("fractions", len(fractions))
+    rows = []
+    for (fx_path, _, _), fx_metrics in zip(fractions, metrics):
+        rows.append({
+            'patient_id': patient_path.name,
+            'data_type': data_type,
+            'fraction': fx_path.name,
+            'reproducibility': fx_metrics[0],
+            'lvl_mean': fx_metrics[1],
+            'lvl_std': fx_metrics[2],
+            'stability': fx_metrics[3],
+            'error_mean': fx_metrics[4],
+            'error_std': fx_metrics[5]
+        })
+    intervals = interval_table(data_type, patient_path, fractions, stacked) if with_intervals else None
+    return rows, timer.as_dict(), intervals
+
+def interval_table(data_type, patient_path, fractions, stacked):
+    """One row per beam-enabled interval of processing.stack_intervals(): its beam times, sample count, level and error"""
+    intervals_per_field = stacked['intervals_per_field']
+    field_fractions, field_numbers = stacked['field_fractions'].tolist(), stacked['field_numbers'].tolist()
+    fx_names = np.array([fractions[fx_idx][0].name for fx_idx in field_fractions], dtype=object)
+    field_names = np.array([fractions[fx_idx][1][field_idx].name for fx_idx, field_idx in zip(field_fractions, field_numbers)],
+                           dtype=object)
+    field_offsets = np.cumsum(intervals_per_field) - intervals_per_field
+    return pd.DataFrame({
+        'patient_id': patient_path.name,
+        'data_type': data_type,
+        'fraction': np.repeat(fx_names, intervals_per_field),
+        'field': np.repeat(field_names, intervals_per_field),
+        'interval': np.arange(intervals_per_field.sum()) - np.repeat(field_offsets, intervals_per_field),
+        'beam_on': stacked['beam_on'],
+        'beam_off': stacked['beam_off'],
+        'samples': stacked['samples'],
+        'level': stacked['levels'],
+        'error': stacked['errors']
+    })
+
+class AnalysisEngine:
+    """
+    Runs the jobs of a scanned archive (see dataloader.scan_archive), one per patient, on a process pool.
+    Rows are returned in archive order (data type -> patient -> fraction), whatever order jobs finish in.
+    With an interval_callback, each job's per-interval metrics table is passed to it (in completion order).
+    With a ProcessedManifest, fractions whose field files did not change since the last run are skipped.
+    With a row_callback, rows are streamed (still in archive order) instead of collected, and at most
+    `window` patient jobs are in flight or waiting for an earlier job, so memory stays bounded on large archives.
+    """
+    def __init__(self, max_workers=None, cache_dir=None, window=None, timer=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        self.window = window or 4 * self.max_workers
+        self.timer = timer or StageTimer() # Stage timings of all jobs are merged here
+        self.fingerprints = dict() # Fraction path -> fingerprint of the fractions analyzed (and released) by the last run
+        self.skipped = [] # Unchanged fraction paths skipped by the last run
+        self.cancelled = False # True if the last run was stopped through its cancel_event
+
+    def run(self, archive, status_callback=print, progress_callback=None, manifest=None, row_callback=None,
+            interval_callback=None, cancel_event=None):
+        """
+        Rows of every fraction to analyze (collected, or streamed to row_callback).
+        Setting cancel_event (a threading.Event) stops the run between patient jobs: queued jobs are dropped,
+        running ones are abandoned, and rows finished so far are still released. self.cancelled tells if it stopped early.
+        """
+        jobs, patients, job_bytes = [], [], []
+        self.fingerprints, self.skipped, self.cancelled = dict(), [], False
+        for data_type, patient_fractions in archive.items():
+            for patient_path, fractions in patient_fractions.items():
+                patients.append((data_type, patient_path))
+                to_analyze, num_bytes = [], 0
+                for fx_path, field_stats in fractions.items():
+                    fields = [field_path for field_path, _, _ in field_stats]
+                    fingerprint = FieldCache.fingerprint_from_stats(field_stats)
+                    if manifest is not None and manifest.is_current(fx_path, fingerprint):
+                        self.skipped.append(fx_path)
+                        continue
+                    to_analyze.append((fx_path, fields, fingerprint))
+                    num_bytes += sum(size for _, _, size in field_stats)
+                if to_analyze: # One job per patient: its fractions share a single vectorized metrics pass
+                    job_bytes.append(num_bytes)
+                    jobs.append((len(patients) - 1, (data_type, patient_path, to_analyze, self.cache_dir,
+                                                     interval_callback is not None)))
+
+        if manifest is not None:
+            num_fractions = sum(len(args[2]) for _, args in jobs)
+            status_callback(f"Skipping {len(self.skipped)} unchanged fractions, analyzing {num_fractions} new or changed fractions...")
+
+        # Progress follows the bytes of field files analyzed, so large fractions weigh more than small ones
+        tracker = None
+        if progress_callback is not None:
+            tracker = ProgressTracker(sum(job_bytes), sum(len(args[2]) for _, args in jobs), progress_callback)
+
+        results = [None] * len(jobs)
+        pending = dict() # Finished job index -> rows, until every earlier job has finished
+        next_release = 0
+        done_patients = 0
+
+        def is_cancelled():
+            if cancel_event is not None and cancel_event.is_set() and not self.cancelled:
+                self.cancelled = True
+                status_callback("Cancelling analysis...")
+            return self.cancelled
+
+        def release(job_idx, rows):
+            """Hands the rows of a job on; their fractions then count as analyzed (see self.fingerprints)"""
+            if row_callback is None:
+                results[job_idx] = rows
+            else:
+                for row in rows:
+                    row_callback(row)
+            for fx_path, _, fingerprint in jobs[job_idx][1][2]:
+                self.fingerprints[fx_path] = fingerprint
+
+        def patient_done(patient_idx):
+            nonlocal done_patients
+            done_patients += 1
+            data_type, patient_path = patients[patient_idx]
+            status_callback(f"Analyzed patient {patient_path.name} in {data_type} ({done_patients}/{len(patients)})")
+
+        def job_done(job_idx, job_result):
+            nonlocal next_release
+            rows, job_timings, intervals = job_result
+            self.timer.merge(job_timings)
+            if interval_callback is not None:
+                interval_callback(intervals)
+            pending[job_idx] = rows
+            while next_release in pending:
+                release(next_release, pending.pop(next_release))
+                next_release += 1
+            if tracker is not None:
+                tracker.advance(job_bytes[job_idx], len(rows))
+            patient_done(jobs[job_idx][0])
+
+        analyzed = {patient_idx for patient_idx, _ in jobs}
+        for patient_idx in range(len(patients)):
+            if patient_idx not in analyzed: # No fractions to analyze
+                patient_done(patient_idx)
+
+        if tracker is not None and not jobs: # Nothing to analyze
+            tracker.advance(0, 0)
+
+        if self.max_workers == 1:
+            for job_idx, (_, args) in enumerate(jobs):
+                if is_cancelled():
+                    break
+                job_done(job_idx, analyze_fractions(*args))
+        else:
+            status_callback(f"Analyzing {len(patients)} patients with {self.max_workers} worker processes...")
+            # spawn: never fork a process that is running Qt threads
+            context = multiprocessing.get_context("spawn")
+            executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            try:
+                futures = dict()
+                next_submit = 0
+                while (next_submit < len(jobs) or futures) and not is_cancelled():
+                    # Streaming: never run further ahead than `window` jobs past the next rows to release
+                    limit = len(jobs) if row_callback is None else next_release + self.window
+                    while next_submit < min(limit, len(jobs)):
+                        futures[executor.submit(analyze_fractions, *jobs[next_submit][1])] = next_submit
+                        next_submit += 1
+                    # Wake up regularly to notice a cancellation while long jobs are running
+                    finished, _ = wait(futures, timeout=0.2, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        job_done(futures.pop(future), future.result())
+            finally:
+                # Cancelled: drop queued jobs and let running ones finish in the background
+                executor.shutdown(wait=not self.cancelled, cancel_futures=self.cancelled)
+
+        if self.cancelled: # Rows that finished out of order are still valid
+            for job_idx in sorted(pending):
+                release(job_idx, pending.pop(job_idx))
+            status_callback(f"Analysis cancelled after {len(self.fingerprints)} fractions.")
+
+        return [row for rows in results if rows is not None for row in rows]
@@ -0,0 +1,174 @@
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from app.dataloader import patient_date
+
+def typed_rows(df):
+    """Rows with an integer fraction and the patient date (from ID_yymmdd_NN, None otherwise)"""
+    return df.assign(fraction=pd.to_numeric(df['fraction']), date=df['patient_id'].map(patient_date))
+
+def database_destination(db_manager, table_name):
+    """Where a database sink writes (server, schema and table, without credentials)"""
+    config = db_manager.config
+    return f"mysql://{config.get('host', '')}:{config.get('port', 3306)}/{config.get('database', '')}/{table_name}"
+
+class DatabaseSink:
+    """
+    Upserts result batches through a connected DatabaseManager.
+    Every sink has a `destination` string, which keys the incremental manifest (see app.incremental).
+    """
+    def __init__(self, db_manager, table_name='analysis_results', chunk_size=1000):
+        self.db_manager = db_manager
+        self.table_name = table_name
+        self.chunk_size = chunk_size
+        self.destination = database_destination(db_manager, table_name)
+
+    def write(self, df):
+        return self.db_manager.insert_dataframe(typed_rows(df), self.table_name, chunk_size=self.chunk_size)['rows']
+
+    def close(self):
+        pass
+
+class DatabaseIntervalSink:
+    """
+    Writes per-interval metrics to 'analysis_intervals', replacing earlier intervals of the same fractions.
+    Intervals are written from the analysis thread, so db_manager must not be shared with a DatabaseSink.
+    """
+    def __init__(self, db_manager, chunk_size=5000):
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size
+        self.destination = database_destination(db_manager, 'analysis_intervals')
+
+    def write(self, df):
+        df = df.assign(fraction=pd.to_numeric(df['fraction'])).rename(columns={'interval': 'interval_no'})
+        return self.db_manager.replace_intervals(df, chunk_size=self.chunk_size)
+
+    def close(self):
+        pass
+
+class CsvSink:
+    """Appends result batches to a single CSV file"""
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.header_written = False
+        self.destination = f"csv://{self.path.resolve()}"
+
+    def write(self, df):
+        df.to_csv(self.path, mode='a' if self.header_written else 'w', header=not self.header_written, index=False)
+        self.header_written = True
+        return len(df)
+
+    def close(self):
+        pass
+
+class ParquetSink:
+    """Appends result batches as row groups of a single Parquet file, typed like the "results" dataset (requires pyarrow)"""
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.writer = None
+        self.destination = f"parquet://{self.path.resolve()}"
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = dataset_schema("results")
+        table = pa.Table.from_pandas(typed_rows(df)[schema.names], schema=schema, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, schema)
+        self.writer.write_table(table)
+        return len(df)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+def dataset_schema(kind):
+    """Column types of the "results" (one row per fraction) and "intervals" (one row per beam-enabled interval) datasets"""
+    import pyarrow as pa
+
+    key = [("patient_id", pa.string()), ("data_type", pa.string()), ("date", pa.date32()), ("fraction", pa.int16())]
+    if kind == "results":
+        metrics = ["reproducibility", "lvl_mean", "lvl_std", "stability", "error_mean", "error_std"]
+        return pa.schema(key + [(name, pa.float64()) for name in metrics])
+    if kind == "intervals":
+        return pa.schema(key + [("field", pa.string()), ("interval", pa.int32()), ("beam_on", pa.float64()),
+                                ("beam_off", pa.float64()), ("samples", pa.int32()), ("level", pa.float64()),
+                                ("error", pa.float64())])
+    raise ValueError(f"Unknown dataset: {kind} (use results or intervals)")
+
+class ParquetDatasetSink:
+    """
+    Appends batches to a Parquet dataset partitioned by data type and patient date (root/data_type=.../date=.../),
+    with typed columns (see dataset_schema). Readers can prune partitions and push filters down, e.g.
+    pq.read_table(root, filters=[("data_type", "=", "STATIC"), ("lvl_std", ">", 1.0)]).
+    Every run writes its own files; the rows (or intervals) that earlier runs wrote for the fractions of a batch
+    are removed from their files first, so a fraction keeps a single version like in the database.
+    """
+    def __init__(self, root_dir, kind="results"):
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.kind = kind
+        self.destination = f"parquet-dataset://{self.root_dir.resolve()}"
+        self.run_id = f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}"
+        self.batches = 0
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.dataset as pads
+
+        schema = dataset_schema(self.kind)
+        df = typed_rows(df)
+        table = pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+        partitioning = pads.partitioning(pa.schema([schema.field("data_type"), schema.field("date")]), flavor="hive")
+        self._drop_earlier_rows(df, partitioning)
+        pads.write_dataset(table, self.root_dir, format="parquet", partitioning=partitioning,
+                           basename_template=f"{self.kind}-{self.run_id}-{self.batches}-{{i}}.parquet",
+                           existing_data_behavior="overwrite_or_ignore")
+        self.batches += 1
+        return len(df)
+
+    def _drop_earlier_rows(self, df, partitioning):
+        """Removes the (patient_id, fraction) keys of df from the files of earlier runs in the partitions df writes to"""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        for (data_type, date), group in df.groupby(['data_type', 'date'], dropna=False, sort=False):
+            date_filter = pc.field("date").is_null() if pd.isna(date) else pc.field("date") == pa.scalar(date, pa.date32())
+            partition_dir = self.root_dir / partitioning.format((pc.field("data_type") == data_type) & date_filter)[0]
+            if not partition_dir.is_dir():
+                continue
+            keys = pd.MultiIndex.from_frame(group[['patient_id', 'fraction']])
+            for path in partition_dir.glob("*.parquet"):
+                if self.run_id in path.name:
+                    continue
+                table = pq.read_table(path)
+                stale = pd.MultiIndex.from_arrays([table['patient_id'].to_pandas(),
+                                                   table['fraction'].to_pandas()]).isin(keys)
+                if not stale.any():
+                    continue
+                if stale.all():
+                    os.remove(path)
+                    continue
+                tmp_path = path.with_name(path.name + ".tmp")
+                pq.write_table(table.filter(pa.array(~stale)), tmp_path)
+                os.replace(tmp_path, path)
+
+    def close(self):
+        pass
+
+def file_sink(path):
+    """CSV or Parquet sink, chosen by the file extension"""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        return CsvSink(path)
+    if suffix in (".parquet", ".pq"):
+        return ParquetSink(path)
+    raise ValueError(f"Unsupported output format: {path} (use .csv or .parquet)")
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+import numpy as np
+from app import dataloader
+from app.instrumentation import timed
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "respiration_analysis"
+BUNDLE_VERSION = 2 # Bumped whenever parsing changes, so bundles of an older parser are parsed again
+# Pruning after each run: bundles unused for this many days are removed, then the least recently used ones
+# until the cache fits in RESPIRATION_CACHE_MAX_MB (0: no size limit)
+DEFAULT_MAX_AGE_DAYS = float(os.getenv("RESPIRATION_CACHE_MAX_AGE_DAYS", "30"))
+DEFAULT_MAX_MB = float(os.getenv("RESPIRATION_CACHE_MAX_MB", "0"))
+STALE_TMP_SECONDS = 3600 # Temporary files older than this were left by an interrupted write
+
+class FieldCache:
+    """
+    Persistent cache of parsed field data, one .npz bundle per fraction.
+    A bundle is only reused while every field file keeps its path, mtime and size.
+    A bundle's mtime is its last use, which prune() relies on to remove bundles of moved or deleted fractions.
+    """
+    def __init__(self, cache_dir=None):
+        self.cache_dir = Path(cache_dir or os.getenv("RESPIRATION_CACHE_DIR", DEFAULT_CACHE_DIR))
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.hits, self.misses = 0, 0
+
+    @staticmethod
+    def fingerprint_from_stats(field_stats):
+        """Cache key of a fraction from the (path, mtime_ns, size) of every field file (see dataloader.scan_archive)"""
+        return json.dumps([[str(field_path), mtime_ns, size] for field_path, mtime_ns, size in field_stats])
+
+    def bundle_path(self, fx_path):
+        digest = hashlib.sha1(str(Path(fx_path).resolve()).encode()).hexdigest()
+        return self.cache_dir / f"{digest}.npz"
+
+    def load_fraction(self, fx_path, field_paths, timer=None, key=None):
+        """Parsed (times, amps), (beam times, beam states) of every field, from cache when still valid"""
+        if key is None: # Not known from dataloader.scan_archive
+            key = self.fingerprint_from_stats([(field_path, stat.st_mtime_ns, stat.st_size)
+                                               for field_path, stat in zip(field_paths, map(os.stat, field_paths))])
+        bundle_path = self.bundle_path(fx_path)
+
+        with timed(timer, "cache_load"):
+            series = self._read_bundle(bundle_path, key, len(field_paths))
+        if series is not None:
+            self.hits += 1
+            self._touch(bundle_path)
+            if timer is not None:
+                timer.count("cache_hits")
+            return series
+
+        self.misses += 1
+        series = [dataloader.read_field_data(f, timer=timer) for f in field_paths]
+        with timed(timer, "cache_store"):
+            self._write_bundle(bundle_path, key, series)
+        if timer is not None:
+            timer.count("cache_misses")
+        return series
+
+    def bundles(self):
+        """(path, mtime, size) of every bundle in the cache directory"""
+        entries = []
+        for bundle_path in self.cache_dir.glob("*.npz"):
+            try:
+                stat = bundle_path.stat()
+            except OSError:
+                continue # Removed meanwhile
+            entries.append((bundle_path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def prune(self, max_age_days=DEFAULT_MAX_AGE_DAYS, max_mb=DEFAULT_MAX_MB):
+        """
+        Removes bundles unused for max_age_days (0: no age limit), then the least recently used ones until
+        the bundles take at most max_mb (0: no size limit), and stale temporary files. Returns the number removed.
+        """
+        now = time.time()
+        entries = sorted(self.bundles(), key=lambda entry: entry[1], reverse=True) # Most recently used first
+        keep_bytes = max_mb * 1e6 if max_mb > 0 else float("inf")
+        removed, total_bytes = [], 0
+        for bundle_path, mtime, size in entries:
+            if (max_age_days > 0 and now - mtime > max_age_days * 86400) or total_bytes + size > keep_bytes:
+                removed.append(bundle_path)
+            else:
+                total_bytes += size
+        for tmp_path in self.cache_dir.glob("*.tmp"):
+            try:
+                if now - tmp_path.stat().st_mtime > STALE_TMP_SECONDS:
+                    removed.append(tmp_path)
+            except OSError:
+                continue
+        return self._remove(removed)
+
+    def clear(self):
+        """Removes every bundle (and temporary file); incremental manifests are kept. Returns the number removed."""
+        return self._remove([bundle_path for bundle_path, _, _ in self.bundles()] + list(self.cache_dir.glob("*.tmp")))
+
+    @staticmethod
+    def _remove(paths):
+        removed = 0
+        for path in paths:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass # Another process removed it first
+            except OSError as err:
+                print(f"Failed to remove cache file {path}: {err}")
+        return removed
+
+    @staticmethod
+    def _touch(bundle_path):
+        try:
+            os.utime(bundle_path)
+        except OSError:
+            pass # Read-only cache: the bundle is still valid, it may only be pruned earlier
+
+    def _read_bundle(self, bundle_path, key, num_fields):
+        if not bundle_path.exists():
+            return None
+        try:
+            with np.load(bundle_path) as bundle:
+                if int(bundle["version"]) != BUNDLE_VERSION or str(bundle["key"]) != key:
+                    return None
+                return [((bundle[f"times_{i}"], bundle[f"amps_{i}"]),
+                         (bundle[f"beam_times_{i}"], bundle[f"beam_states_{i}"]))
+                        for i in range(num_fields)]
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            return None # Corrupt or outdated bundle, parse again
+
+    def _write_bundle(self, bundle_path, key, series):
+        arrays = {"version": np.array(BUNDLE_VERSION), "key": np.array(key)}
+        for i, ((data_Times, data_Amps), (beam_Times, beam_States)) in enumerate(series):
+            arrays[f"times_{i}"], arrays[f"amps_{i}"] = data_Times, data_Amps
+            arrays[f"beam_times_{i}"], arrays[f"beam_states_{i}"] = beam_Times, beam_States
+
+        # Write to a temporary file first so that readers never see a half-written bundle
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                np.savez(file, **arrays)
+            os.replace(tmp_path, bundle_path)
+        except OSError as err:
+            print(f"Failed to write cache bundle {bundle_path}: {err}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
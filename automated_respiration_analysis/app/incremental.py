@@ -0,0 +1,47 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from app.field_cache import FieldCache
+
+class ProcessedManifest:
+    """
+    Sidecar record of the fractions already analyzed and written to a set of destinations.
+    Each fraction directory maps to the fingerprint (path, mtime, size of every field file) it had when analyzed.
+    The manifest is keyed by the data root and the destinations (the sinks' `destination` strings), so a run
+    that writes somewhere else (another file, database or table) does not skip fractions it never received.
+    """
+    def __init__(self, data_root, cache_dir=None, destinations=()):
+        cache_dir = FieldCache(cache_dir).cache_dir
+        self.destinations = sorted(set(destinations))
+        key = json.dumps([str(Path(data_root).resolve()), self.destinations])
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        self.path = cache_dir / f"manifest_{digest}.json"
+        self.data_root = str(data_root)
+        self.fractions = self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return dict()
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file).get("fractions", dict())
+        except (OSError, ValueError) as err:
+            print(f"Ignoring unreadable manifest {self.path}: {err}")
+            return dict()
+
+    def is_current(self, fx_path, fingerprint):
+        """True if the fraction was analyzed before and none of its field files changed since"""
+        return self.fractions.get(str(fx_path)) == fingerprint
+
+    def update(self, fingerprints):
+        """Records {fraction path: fingerprint} of freshly written fractions"""
+        self.fractions.update({str(fx_path): fingerprint for fx_path, fingerprint in fingerprints.items()})
+
+    def save(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            json.dump({"data_root": self.data_root, "destinations": self.destinations, "fractions": self.fractions}, file)
+        os.replace(tmp_path, self.path)
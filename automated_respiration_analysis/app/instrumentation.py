@@ -0,0 +1,135 @@
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+DEFAULT_LOG_DIR = Path.home() / ".cache" / "respiration_analysis" / "logs"
+
+class StageTimer:
+    """
+    Wall-clock time per pipeline stage plus work counters (files read, bytes parsed, intervals, rows written).
+    Thread-safe; timers of worker processes are shipped back as dicts and merged.
+    """
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.lock = threading.Lock()
+        self.start_time = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.seconds[name] += elapsed
+                self.calls[name] += 1
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def as_dict(self):
+        with self.lock:
+            return {'seconds': dict(self.seconds), 'calls': dict(self.calls), 'counters': dict(self.counters)}
+
+    def merge(self, other):
+        """Adds the as_dict() of another timer (e.g. from a worker process)"""
+        with self.lock:
+            for name, value in other['seconds'].items():
+                self.seconds[name] += value
+            for name, value in other['calls'].items():
+                self.calls[name] += value
+            for name, value in other['counters'].items():
+                self.counters[name] += value
+
+    def report(self):
+        """Structured timing report; stage seconds of worker processes add up (CPU-seconds across workers)"""
+        timings = self.as_dict()
+        wall = time.perf_counter() - self.start_time
+        stages = {name: {'seconds': round(seconds, 6), 'calls': timings['calls'].get(name, 0)}
+                  for name, seconds in sorted(timings['seconds'].items(), key=lambda item: -item[1])}
+        counters = timings['counters']
+        parse_seconds = timings['seconds'].get('file_io', 0.0) + timings['seconds'].get('parse', 0.0)
+        return {
+            'wall_seconds': round(wall, 6),
+            'stages': stages,
+            'counters': counters,
+            'throughput': {
+                'fractions_per_second': round(counters.get('fractions', 0) / wall, 3) if wall else 0.0,
+                'parse_mb_per_second': round(counters.get('bytes_parsed', 0) / 1e6 / parse_seconds, 3) if parse_seconds else 0.0
+            }
+        }
+
+def timed(timer, name):
+    """timer.stage(name), or a no-op without a timer"""
+    return timer.stage(name) if timer is not None else contextlib.nullcontext()
+
+def log_dir():
+    return Path(os.getenv("RESPIRATION_LOG_DIR", DEFAULT_LOG_DIR))
+
+def write_timing_log(report):
+    """Appends the report as one JSON line to timings.jsonl in the log directory"""
+    path = log_dir() / "timings.jsonl"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as file:
+        file.write(json.dumps({'timestamp': datetime.now().isoformat(timespec="seconds"), **report}) + "\n")
+    return path
+
+@contextlib.contextmanager
+def profiling(mode=None):
+    """
+    Optional profile of the calling process: "cprofile" or "tracemalloc" (default: RESPIRATION_PROFILE env var).
+    Worker processes are not profiled; run with a single worker to profile the analysis hot path itself.
+    The output path is stored in the yielded dict under 'profile_path'.
+    """
+    mode = mode or os.getenv("RESPIRATION_PROFILE", "") or None
+    result = dict()
+    if mode is None:
+        yield result
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode} (use one of {', '.join(PROFILE_MODES)})")
+
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = log_dir() / f"profile_{stamp}.{'prof' if mode == 'cprofile' else 'txt'}"
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield result
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(20)
+            print(summary.getvalue(), file=sys.stderr) # stdout is reserved for the CLI's JSON summary
+            result['profile_path'] = str(path)
+    else:
+        tracemalloc.start()
+        try:
+            yield result
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            lines = [f"Peak traced memory: {peak / 1e6:.1f} MB"]
+            lines += [str(stat) for stat in snapshot.statistics("lineno")[:20]]
+            path.write_text("\n".join(lines) + "\n")
+            print("\n".join(lines), file=sys.stderr)
+            result['profile_path'] = str(path)
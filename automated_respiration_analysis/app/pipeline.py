@@ -0,0 +1,120 @@
+from pathlib import Path
+
+from app import dataloader
+from app.engine import AnalysisEngine
+from app.field_cache import FieldCache
+from app.incremental import ProcessedManifest
+from app.instrumentation import StageTimer, profiling, write_timing_log
+from app.streaming import ResultWriter
+
+def run_analysis(data_root, sinks, max_workers=None, cache_dir=None, batch_size=1000, incremental=False,
+                 status_callback=print, progress_callback=None, batch_callback=None,
+                 timing_callback=None, profile=None, scan_workers=None, interval_sinks=None, cancel_event=None,
+                 clear_cache=False):
+    """
+    Analyzes every fraction under data_root and streams the result rows into the sinks (see app.export).
+    Qt-free: drives both AnalysisWorker and the headless CLI. Returns a summary dict of the run.
+    The archive is scanned once up front with scan_workers threads (see dataloader.scan_archive).
+    With interval_sinks, the metrics of every beam-enabled interval are written to them as well.
+    Setting cancel_event (a threading.Event) stops the analysis between patients; the rows finished so far are
+    still written (and recorded as processed for incremental runs), and the summary reports 'cancelled'.
+    The parsed-field cache is emptied first with clear_cache, and pruned after every run (see FieldCache.prune).
+    The per-stage timing report is passed to timing_callback and appended to the timing log;
+    `profile` ("cprofile"/"tracemalloc", default: RESPIRATION_PROFILE) additionally profiles this process.
+    """
+    timer = StageTimer()
+    with profiling(profile) as profile_result:
+        summary = _run(Path(data_root), sinks, timer, max_workers, cache_dir, batch_size, incremental,
+                       status_callback, progress_callback, batch_callback, scan_workers, interval_sinks or [],
+                       cancel_event, clear_cache)
+
+    report = timer.report()
+    summary['seconds'] = report['wall_seconds']
+    summary['timing'] = report
+    if 'profile_path' in profile_result:
+        summary['profile_path'] = profile_result['profile_path']
+    log_path = write_timing_log(report)
+    status_callback(f"Timing report written to {log_path}")
+    if timing_callback is not None:
+        timing_callback(report)
+    return summary
+
+def _run(data_root, sinks, timer, max_workers, cache_dir, batch_size, incremental,
+         status_callback, progress_callback, batch_callback, scan_workers, interval_sinks, cancel_event, clear_cache):
+    status_callback("Starting analysis...")
+    cache = FieldCache(cache_dir)
+    if clear_cache:
+        status_callback(f"Cleared {cache.clear()} cached fractions from {cache.cache_dir}.")
+
+    if not data_root.exists() or not data_root.is_dir():
+        raise FileNotFoundError(f"Data directory not found: {data_root}")
+
+    status_callback("Scanning patient data...")
+    with timer.stage("scan"):
+        archive = dataloader.scan_archive(data_root, max_workers=scan_workers)
+
+    if not archive:
+        raise ValueError("No patient data found in the selected directory.")
+
+    num_patients = sum(len(patient_fractions) for patient_fractions in archive.values())
+    num_fractions = sum(len(fractions) for patient_fractions in archive.values() for fractions in patient_fractions.values())
+    num_fields = sum(len(field_stats) for patient_fractions in archive.values()
+                     for fractions in patient_fractions.values() for field_stats in fractions.values())
+    timer.count("patients", num_patients)
+    timer.count("field_files", num_fields)
+    status_callback(f"Found {num_patients} patients, {num_fractions} fractions, {num_fields} field files.")
+
+    manifest = None
+    if incremental: # One manifest per data root and set of destinations
+        manifest = ProcessedManifest(data_root, cache_dir, [sink.destination for sink in sinks + interval_sinks])
+    # Rows stream through a bounded queue into the writer, which flushes and reports them batch by batch
+    engine = AnalysisEngine(max_workers=max_workers, cache_dir=cache_dir, timer=timer)
+    writer = ResultWriter(sinks, batch_size=batch_size, on_batch=batch_callback, timer=timer).start()
+    intervals_written = 0
+
+    def write_intervals(intervals):
+        nonlocal intervals_written
+        if len(intervals):
+            with timer.stage("write_intervals"):
+                intervals_written += min(sink.write(intervals) for sink in interval_sinks)
+
+    try:
+        engine.run(archive,
+                   status_callback=status_callback,
+                   progress_callback=progress_callback,
+                   manifest=manifest,
+                   row_callback=writer.put,
+                   interval_callback=write_intervals if interval_sinks else None,
+                   cancel_event=cancel_event)
+        status_callback("Analysis cancelled. Saving finished results..." if engine.cancelled
+                        else "Analysis complete. Saving remaining results...")
+    finally:
+        writer.close()
+        for sink in sinks + interval_sinks:
+            sink.close()
+
+    status_callback(f"{writer.rows_written}/{writer.rows_received} results written in {writer.batches} batches.")
+
+    if manifest is not None and writer.complete:
+        # Only fractions that reached every sink count as processed
+        manifest.update(engine.fingerprints)
+        manifest.save()
+        status_callback(f"Incremental run: {len(engine.fingerprints)} fractions analyzed, {len(engine.skipped)} unchanged fractions skipped.")
+
+    with timer.stage("cache_prune"):
+        pruned = cache.prune()
+    if pruned:
+        status_callback(f"Pruned {pruned} unused files from the parsed-field cache.")
+
+    return {
+        'data_root': str(data_root),
+        'data_types': len(archive),
+        'patients': num_patients,
+        'fractions_analyzed': writer.rows_received,
+        'fractions_skipped': len(engine.skipped),
+        'rows_written': writer.rows_written,
+        'batches': writer.batches,
+        'intervals_written': intervals_written,
+        'complete': writer.complete,
+        'cancelled': engine.cancelled
+    }
@@ -1,5 +1,6 @@
 import numpy as np
 from app import dataloader
+from app.instrumentation import timed
 
 def beam_modification(beam_Times, beam_States):
     """Modifies beam times to handle short intervals."""
@@ -19,30 +20,33 @@ def beam_modification(beam_Times, beam_States):
             
     return modified_intervals
 
+def _enabled_interval_bounds(data_Times, beam_on, beam_off):
+    """
+    Sample ranges [start, end) of the beam-enabled intervals: first sample at or after every beam-on / beam-off time
+    (data_Times must be sorted, as recorded). Beams starting after the last sample and empty intervals are skipped;
+    the mask of the kept beams is returned with the bounds.
+    """
+    start_indices = np.searchsorted(data_Times, beam_on, side="left")
+    end_indices = np.searchsorted(data_Times, beam_off, side="left")
+    enabled = start_indices < end_indices
+    return start_indices[enabled], end_indices[enabled], enabled
+
 def beam_enabling_intervals(data_Times, data_Amps, beam_Times):
-    """Returns the enabled intervals and their count."""
-    dt = 0.015
-    total_intervals = []
-    for i in range(len(beam_Times)//2):
-        start_time = beam_Times[2*i]
-        end_time = beam_Times[2*i+1]
-        
-        start_index = next((j for j, t in enumerate(data_Times) if t >= start_time), None)
-        
-        if start_index is None:
-            continue
-            
-        end_index = next((j for j, t in enumerate(data_Times) if t >= end_time), len(data_Times))
-        
-        interval = data_Amps[start_index:end_index]
-        if interval:
-            total_intervals.append(interval)
+    """Returns the enabled intervals (views of data_Amps) and their count."""
+    """data_Times must be sorted in ascending order (as recorded)"""
+    data_Times, data_Amps = np.asarray(data_Times), np.asarray(data_Amps)
+    beam_Times = np.asarray(beam_Times, dtype=np.float64)
+    num_pairs = len(beam_Times) // 2
 
+    start_indices, end_indices, _ = _enabled_interval_bounds(data_Times, beam_Times[0:2*num_pairs:2],
+                                                             beam_Times[1:2*num_pairs:2])
+    total_intervals = [data_Amps[start_index:end_index]
+                       for start_index, end_index in zip(start_indices.tolist(), end_indices.tolist())]
     return total_intervals, len(total_intervals)
 
 def avg_lvl_per_interval(Amps):
     """Calculates the average level per interval."""
-    if not Amps:
+    if len(Amps) == 0:
         return 0.0
     return np.sum(Amps) / len(Amps)
 
@@ -62,57 +66,229 @@ def error_per_interval(Amps):
     duration = dt * ( len(Amps) - 1 )
     return abs(slope) * duration
 
+def beam_on_off(beam_Times, beam_States):
+    """Vectorized beam_modification: (beam-on times, beam-off times) of the intervals lasting at least 0.1 s"""
+    beam_Times, beam_States = np.asarray(beam_Times, dtype=np.float64), np.asarray(beam_States)
+    order = np.lexsort((beam_States, beam_Times)) # Same order as sorted(zip(times, states))
+    times, states = beam_Times[order], beam_States[order]
+
+    # A beam-off closes an interval when a beam-on came after the previous beam-off; the latest beam-on wins
+    positions = np.arange(len(states))
+    last_on = np.maximum.accumulate(np.where(states == 1, positions, -1)) if len(states) else positions
+    offs = np.flatnonzero(states == 0)
+    previous_offs = np.concatenate(([-1], offs[:-1]))
+    closing = offs[last_on[offs] > previous_offs]
+    starts, ends = times[last_on[closing]], times[closing]
+    kept = ends - starts >= 0.1
+    return starts[kept], ends[kept]
+
+# Relative bound used for the closed-form interval errors: they stay within ~4e-14 of np.polyfit (measured on
+# intervals of 2 to 100000 samples), so a published error metric farther than this from a 4-decimal rounding
+# boundary rounds like the polyfit result; closer ones are recomputed with np.polyfit (see reduce_cohort_metrics)
+CLOSED_FORM_TOLERANCE = 1e-9
+
+def _segment_sums(values, offsets):
+    """
+    np.sum of the consecutive segments of values starting at offsets (segments must be non-empty), in one pass.
+    np.add.reduceat adds a segment's first value to the pairwise sum of the others, while np.sum adds 0.0 to the
+    pairwise sum of the whole segment: with a 0.0 in front of every segment, reduceat makes the very same additions.
+    """
+    padded = np.insert(values, offsets, 0.0)
+    return np.add.reduceat(padded, offsets + np.arange(len(offsets)))
+
+def _segment_running_sums(values, counts):
+    """Sums of consecutive segments, each added left to right like the `total += value` loop of the per-field code"""
+    rows = np.repeat(np.arange(len(counts)), counts)
+    columns = np.arange(len(values)) - np.repeat(np.cumsum(counts) - counts, counts)
+    table = np.zeros((len(counts), int(counts.max())))
+    table[rows, columns] = values
+    return np.cumsum(table, axis=1)[:, -1] # Accumulation is sequential; the zero padding adds nothing
+
+def _segment_stats(values, offsets, counts):
+    """max - min, max, np.mean and np.std of consecutive segments, with the same operations as NumPy on each segment"""
+    maxima = np.maximum.reduceat(values, offsets)
+    means = _segment_sums(values, offsets) / counts
+    deviations = values - np.repeat(means, counts)
+    stds = np.sqrt(_segment_sums(deviations * deviations, offsets) / counts)
+    return maxima - np.minimum.reduceat(values, offsets), maxima, means, stds
+
+def _near_rounding_boundary(values, margin):
+    """True where np.round(values, 4) may change when values move by up to margin"""
+    scaled = values * 1e4
+    return np.abs(scaled - np.floor(scaled) - 0.5) <= margin * 1e4
+
+def _segment_metrics(Amps, lengths):
+    """
+    Level and vertical error of consecutive segments of Amps (lengths must be positive).
+    Levels are bit-identical to avg_lvl_per_interval (see _segment_sums). Errors use the closed-form least-squares
+    slope, which can differ from np.polyfit in the last bits (see CLOSED_FORM_TOLERANCE).
+    """
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    n = lengths.astype(np.float64)
+
+    # Sample index within its interval, centered on the interval's mean index (n-1)/2
+    centered = np.arange(len(Amps)) - np.repeat(offsets + (n - 1) / 2, lengths)
+    sum_Amps = _segment_sums(Amps, offsets)
+    sum_cross = np.add.reduceat(centered * Amps, offsets)
+
+    levels = sum_Amps / n
+    # slope = sum_cross / (dt * n(n^2-1)/12) and duration = dt * (n-1), so dt cancels out
+    errors = np.zeros(len(lengths))
+    fitted = lengths >= 2
+    errors[fitted] = np.abs(sum_cross[fitted]) * 12 / (n[fitted] * (n[fitted] + 1))
+    return levels, errors
+
+def interval_metrics(intervals):
+    """Average level and vertical error of every interval in one pass"""
+    """Same least-squares fit as error_per_interval, in closed form over the fixed dt grid (intervals must be non-empty)"""
+    if len(intervals) == 0:
+        return np.zeros(0), np.zeros(0)
+    lengths = np.fromiter((len(intv) for intv in intervals), dtype=np.int64, count=len(intervals))
+    return _segment_metrics(np.concatenate(intervals).astype(np.float64, copy=False), lengths)
+
 def stability(errors):
     """Calculates stability as the maximum error."""
     if not errors:
         return 0.0
     return max(errors)
 
-def compute_fraction_metrics(list_of_field_series):
-    per_field_levels, per_field_errors = [], []
-    for (data_Times, data_Amps), (beam_Times, beam_States) in list_of_field_series:
-        modified_beam_Times = beam_modification(beam_Times, beam_States)
-        enabled_intervals, num_intervals = beam_enabling_intervals(data_Times, data_Amps, modified_beam_Times)
-        total_intv_levels, total_intv_errors = 0, 0
-        
-        if num_intervals == 0:
-            continue
-
-        for intv in range(num_intervals):
-            average_level = avg_lvl_per_interval(enabled_intervals[intv])
-            vertical_error = error_per_interval(enabled_intervals[intv])
-            total_intv_levels += average_level
-            total_intv_errors += vertical_error
-        
-        per_field_levels.append((total_intv_levels / num_intervals))
-        per_field_errors.append((total_intv_errors / num_intervals))
+def stack_intervals(cohort_series):
+    """
+    Beam-enabled intervals of every field of every fraction in cohort_series (the list_of_field_series of each fraction),
+    with their level and vertical error computed in one segmented pass over a flat array of all their samples.
+    Per interval: levels, errors, samples, beam_on, beam_off; per field with intervals: intervals_per_field,
+    field_fractions (fraction index), field_numbers (index of the field within its fraction).
+    'amps' holds the samples of all intervals back to back.
+    """
+    amps_parts, length_parts, on_parts, off_parts = [], [], [], []
+    intervals_per_field, field_fractions, field_numbers = [], [], []
+    for fx_idx, list_of_field_series in enumerate(cohort_series):
+        for field_idx, ((data_Times, data_Amps), (beam_Times, beam_States)) in enumerate(list_of_field_series):
+            beam_on, beam_off = beam_on_off(beam_Times, beam_States)
+            start_indices, end_indices, enabled = _enabled_interval_bounds(data_Times, beam_on, beam_off)
+            if not len(start_indices):
+                continue
+
+            # Gather the samples of every interval back to back
+            lengths = end_indices - start_indices
+            gather = np.arange(lengths.sum()) + np.repeat(start_indices - (np.cumsum(lengths) - lengths), lengths)
+            amps_parts.append(np.asarray(data_Amps, dtype=np.float64)[gather])
+            length_parts.append(lengths)
+            on_parts.append(beam_on[enabled])
+            off_parts.append(beam_off[enabled])
+            intervals_per_field.append(len(start_indices))
+            field_fractions.append(fx_idx)
+            field_numbers.append(field_idx)
+
+    stacked = {
+        'intervals_per_field': np.array(intervals_per_field, dtype=np.int64),
+        'field_fractions': np.array(field_fractions, dtype=np.int64),
+        'field_numbers': np.array(field_numbers, dtype=np.int64)
+    }
+    if not intervals_per_field:
+        stacked.update({name: np.zeros(0) for name in ('amps', 'levels', 'errors', 'beam_on', 'beam_off')})
+        stacked['samples'] = np.zeros(0, dtype=np.int64)
+        return stacked
+
+    lengths = np.concatenate(length_parts)
+    stacked['amps'] = np.concatenate(amps_parts)
+    stacked['levels'], stacked['errors'] = _segment_metrics(stacked['amps'], lengths)
+    stacked['samples'] = lengths
+    stacked['beam_on'], stacked['beam_off'] = np.concatenate(on_parts), np.concatenate(off_parts)
+    return stacked
+
+def reduce_cohort_metrics(stacked, num_fractions):
+    """
+    Metrics six-tuple of every fraction from stack_intervals(): intervals -> fields -> fractions, equal to the
+    per-fraction code (running totals per field, then max/min/np.mean/np.std per fraction and np.round to 4 decimals).
+    Fractions with an error metric within CLOSED_FORM_TOLERANCE of a rounding boundary get their interval errors
+    recomputed with np.polyfit (error_per_interval), and stacked['errors'] is updated for them.
+    """
+    results = [(0.0, 0.0, 0.0, 0.0, 0.0, 0.0)] * num_fractions
+    intervals_per_field = stacked['intervals_per_field']
+    if len(intervals_per_field) == 0:
+        return results
+
+    # Fields -> fractions (fractions without any interval keep zeros)
+    fractions, fields_per_fraction = np.unique(stacked['field_fractions'], return_counts=True)
+    fraction_offsets = np.cumsum(fields_per_fraction) - fields_per_fraction
+    field_levels = _segment_running_sums(stacked['levels'], intervals_per_field) / intervals_per_field
+    reprod, _, level_mean, level_std = _segment_stats(field_levels, fraction_offsets, fields_per_fraction)
+
+    field_errors = _segment_running_sums(stacked['errors'], intervals_per_field) / intervals_per_field
+    _, stab, error_mean, error_std = _segment_stats(field_errors, fraction_offsets, fields_per_fraction)
+    margin = CLOSED_FORM_TOLERANCE * (1 + stab)
+    uncertain = (_near_rounding_boundary(stab, margin) | _near_rounding_boundary(error_mean, margin)
+                 | _near_rounding_boundary(error_std, margin))
+    if uncertain.any():
+        interval_fractions = np.repeat(stacked['field_fractions'], intervals_per_field)
+        lengths = stacked['samples']
+        offsets = np.cumsum(lengths) - lengths
+        for idx in np.flatnonzero(np.isin(interval_fractions, fractions[uncertain])).tolist():
+            stacked['errors'][idx] = error_per_interval(stacked['amps'][offsets[idx]:offsets[idx] + lengths[idx]])
+        field_errors = _segment_running_sums(stacked['errors'], intervals_per_field) / intervals_per_field
+        _, stab, error_mean, error_std = _segment_stats(field_errors, fraction_offsets, fields_per_fraction)
 
-    if not per_field_levels or not per_field_errors:
-        return 0.0, 0.0, 0.0, 0.0, 0.0, 0.0
+    metrics = np.round(np.stack([reprod, level_mean, level_std, stab, error_mean, error_std], axis=1), 4)
+    for fx_idx, fx_metrics in zip(fractions.tolist(), metrics.tolist()):
+        results[fx_idx] = tuple(fx_metrics)
+    return results
 
-    inter_reprod = reproducibility(per_field_levels)
-    inter_stab = stability(per_field_errors)
-    level_mean, error_mean = np.mean(per_field_levels), np.mean(per_field_errors)
-    level_std, error_std = np.std(per_field_levels), np.std(per_field_errors)
-    return round(inter_reprod, 4), round(level_mean, 4), round(level_std, 4), round(inter_stab, 4), round(error_mean, 4), round(error_std, 4)
+def compute_cohort_metrics(cohort_series, timer=None):
+    """
+    Metrics six-tuples of many fractions at once; cohort_series holds the list_of_field_series of every fraction.
+    Intervals of all fields of all fractions are stacked into one flat array, then reduced segment by segment:
+    intervals -> fields -> fractions. Identical to compute_fraction_metrics on each fraction.
+    """
+    stacked = stack_intervals(cohort_series)
+    if timer is not None:
+        timer.count("intervals_processed", len(stacked['levels']))
+    return reduce_cohort_metrics(stacked, len(cohort_series))
 
-def batch_processing(total_patients):
+def compute_fraction_metrics(list_of_field_series, timer=None):
+    return compute_cohort_metrics([list_of_field_series], timer=timer)[0]
+
+def list_fractions(patient_path):
+    """Fraction directories of a patient, in treatment order"""
+    return sorted([f for f in patient_path.iterdir() if f.is_dir()], key=lambda x: int(x.name))
+
+def list_fields(fx_path):
+    """Field files of a fraction, in name order"""
+    return sorted([f for f in fx_path.iterdir() if f.is_file()], key=lambda x: x.name)
+
+def fraction_metrics(fx_path, cache=None, fields=None, timer=None, key=None):
+    """
+    Metrics of a single fraction; parsed field data is reused from `cache` (a FieldCache) when given.
+    `key` is the fraction's cache fingerprint when already known (e.g. from dataloader.scan_archive).
+    """
+    if fields is None:
+        fields = list_fields(fx_path)
+
+    if cache is not None:
+        list_of_field_series = cache.load_fraction(fx_path, fields, timer=timer, key=key)
+    else:
+        list_of_field_series = [dataloader.read_field_data(f, timer=timer) for f in fields]
+    with timed(timer, "metrics"):
+        return compute_fraction_metrics(list_of_field_series, timer=timer)
+
+def load_fractions(fractions, cache=None, timer=None):
+    """Field series of several fractions [(fx_path, field paths, cache key or None)], from `cache` when given"""
+    cohort_series = []
+    for fx_path, fields, key in fractions:
+        if cache is not None:
+            cohort_series.append(cache.load_fraction(fx_path, fields, timer=timer, key=key))
+        else:
+            cohort_series.append([dataloader.read_field_data(f, timer=timer) for f in fields])
+    return cohort_series
+
+def batch_processing(total_patients, cache=None):
     total_results = dict()
     for patient_path in total_patients:
         curr_ID = patient_path.name
         patient_results = dict()
         
-        fractions = sorted([f for f in patient_path.iterdir() if f.is_dir()], key=lambda x: int(x.name))
-        
-        for fx_path in fractions:
-            per_fraction_data = []
-            fields = sorted([f for f in fx_path.iterdir() if f.is_file()], key=lambda x: x.name)
-            
-            for fld_data in fields:
-                per_fraction_data.append(fld_data)
-                
-            fx_result = compute_fraction_metrics([dataloader.read_field_data(f) for f in per_fraction_data])
-            patient_results[fx_path.name] = fx_result
+        for fx_path in list_fractions(patient_path):
+            patient_results[fx_path.name] = fraction_metrics(fx_path, cache=cache)
             
         total_results[curr_ID] = patient_results
         
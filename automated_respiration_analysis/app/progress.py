@@ -0,0 +1,60 @@
+import threading
+import time
+
+class ProgressTracker:
+    """
+    Progress of a run measured in field-file bytes (known up front from dataloader.scan_archive).
+    Reports are throttled to one per `min_interval` seconds (default: 10 Hz), plus a final one when all work is done.
+    The ETA is extrapolated from the throughput observed so far. `clock` returns the current time in seconds.
+    """
+    def __init__(self, total_bytes, total_fractions, callback, min_interval=0.1, clock=time.perf_counter):
+        self.total_bytes = total_bytes
+        self.total_fractions = total_fractions
+        self.callback = callback
+        self.min_interval = min_interval
+        self.clock = clock
+        self.done_bytes, self.done_fractions = 0, 0
+        self.start_time = clock()
+        self.last_report = None
+        self.lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.done_fractions >= self.total_fractions
+
+    def advance(self, num_bytes, num_fractions=1):
+        with self.lock:
+            self.done_bytes += num_bytes
+            self.done_fractions += num_fractions
+            now = self.clock()
+            if not self.finished and self.last_report is not None and now - self.last_report < self.min_interval:
+                return
+            self.last_report = now
+            report = self.snapshot(now)
+        self.callback(report)
+
+    def snapshot(self, now=None):
+        """{percent, done/total bytes and fractions, bytes_per_second, eta_seconds (None until measurable)}"""
+        elapsed = (self.clock() if now is None else now) - self.start_time
+        if self.total_bytes:
+            fraction_done = self.done_bytes / self.total_bytes
+        elif self.total_fractions:
+            fraction_done = self.done_fractions / self.total_fractions
+        else:
+            fraction_done = 1.0
+
+        bytes_per_second = self.done_bytes / elapsed if elapsed > 0 else 0.0
+        eta_seconds = None
+        if self.finished:
+            eta_seconds = 0.0
+        elif 0 < fraction_done and elapsed > 0:
+            eta_seconds = elapsed * (1 - fraction_done) / fraction_done
+        return {
+            'percent': min(100, int(fraction_done * 100)),
+            'done_bytes': self.done_bytes,
+            'total_bytes': self.total_bytes,
+            'done_fractions': self.done_fractions,
+            'total_fractions': self.total_fractions,
+            'bytes_per_second': bytes_per_second,
+            'eta_seconds': eta_seconds
+        }
@@ -0,0 +1,97 @@
+import itertools
+import os
+import time
+
+from PyQt5.QtCore import QObject, QThreadPool, pyqtSignal
+from app.analyze import AnalysisWorker
+
+JOB_STATES = ("queued", "running", "cancelling", "cancelled", "finished", "failed")
+
+class AnalysisJob:
+    """One analysis run submitted to the JobScheduler, with its latest status"""
+    def __init__(self, job_id, data_root, worker):
+        self.job_id = job_id
+        self.data_root = data_root
+        self.worker = worker
+        self.state = "queued"
+        self.progress = None # Latest app.progress.ProgressTracker snapshot
+        self.message = ""
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at, self.ended_at = None, None
+
+    @property
+    def active(self):
+        return self.state in ("queued", "running", "cancelling")
+
+class JobScheduler(QObject):
+    """
+    Queue of AnalysisWorker jobs run on a dedicated thread pool, at most `max_concurrent` at a time
+    (each job still fans out over its own worker processes). Jobs can be cancelled while queued or running;
+    a running job stops between patients. job_changed(job_id) is emitted on every status change.
+    """
+    job_changed = pyqtSignal(int)
+
+    def __init__(self, max_concurrent=1, parent=None):
+        super().__init__(parent)
+        self.threadpool = QThreadPool()
+        self.threadpool.setMaxThreadCount(max(1, max_concurrent))
+        self.jobs = dict() # Job id -> AnalysisJob, in submission order
+        self.job_ids = itertools.count(1)
+
+    def workers_per_job(self):
+        """Worker processes for one job: each running job has its own process pool, so the cores are shared between the jobs that can run at once"""
+        return max(1, (os.cpu_count() or 1) // self.threadpool.maxThreadCount())
+
+    def submit(self, data_root, db_config, **worker_kwargs):
+        """Queues an analysis of data_root; worker_kwargs are passed on to AnalysisWorker"""
+        job_id = next(self.job_ids)
+        worker = AnalysisWorker(data_root, db_config, **worker_kwargs)
+        worker.setAutoDelete(False) # The job keeps its worker, e.g. to take it back out of the queue
+        job = AnalysisJob(job_id, data_root, worker)
+        self.jobs[job_id] = job
+
+        signals = worker.signals
+        signals.started.connect(lambda: self._update(job_id, state="running", started_at=time.time()))
+        signals.status.connect(lambda message: self._update(job_id, message=message))
+        signals.progress.connect(lambda progress: self._update(job_id, progress=progress))
+        signals.finished.connect(lambda: self._update(job_id, state="finished", ended_at=time.time()))
+        signals.cancelled.connect(lambda: self._update(job_id, state="cancelled", ended_at=time.time()))
+        signals.error.connect(lambda error: self._update(job_id, state="failed", error=error, message=error,
+                                                         ended_at=time.time()))
+
+        self.threadpool.start(worker)
+        self.job_changed.emit(job_id)
+        return job
+
+    def cancel(self, job_id):
+        job = self.jobs[job_id]
+        if not job.active:
+            return
+        if job.state == "queued" and self.threadpool.tryTake(job.worker):
+            self._update(job_id, state="cancelled", ended_at=time.time())
+            return
+        job.worker.cancel()
+        if job.state != "cancelling":
+            self._update(job_id, state="cancelling")
+
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def active_jobs(self):
+        return [job for job in self.jobs.values() if job.active]
+
+    def wait(self, msecs=-1):
+        """Blocks until every started job has returned (e.g. after cancel_all() on shutdown)"""
+        return self.threadpool.waitForDone(msecs)
+
+    def _update(self, job_id, **changes):
+        job = self.jobs[job_id]
+        if not job.active and 'state' in changes:
+            return # Already settled (e.g. taken out of the queue)
+        if job.state == "cancelling" and changes.get('state') == "running":
+            changes.pop('state')
+        for name, value in changes.items():
+            setattr(job, name, value)
+        self.job_changed.emit(job_id)
@@ -0,0 +1,74 @@
+import queue
+import threading
+
+import pandas as pd
+from app.instrumentation import timed
+
+_END = object()
+
+class ResultWriter:
+    """
+    Background writer fed through a bounded queue.
+    Rows are flushed to every sink (see app.export) in batches of `batch_size`; every flushed batch is also handed
+    to `on_batch` as a DataFrame. put() blocks while the queue is full, so a slow sink throttles the analysis.
+    """
+    def __init__(self, sinks, batch_size=1000, max_queued=None, on_batch=None, timer=None):
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.on_batch = on_batch
+        self.timer = timer
+        self.queue = queue.Queue(maxsize=max_queued or 2 * batch_size)
+        self.thread = threading.Thread(target=self._run, name="ResultWriter", daemon=True)
+        self.rows_received, self.rows_written, self.batches = 0, 0, 0
+        self.error = None
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def put(self, row):
+        if self.error is not None:
+            raise RuntimeError(f"Result writer failed: {self.error}")
+        self.rows_received += 1
+        self.queue.put(row)
+
+    def close(self):
+        """Flushes the remaining rows and waits for the writer; re-raises a writer failure"""
+        self.queue.put(_END)
+        self.thread.join()
+        if self.error is not None:
+            raise RuntimeError(f"Result writer failed: {self.error}")
+
+    @property
+    def complete(self):
+        """True if every received row reached every sink"""
+        return self.error is None and self.rows_written == self.rows_received
+
+    def _run(self):
+        batch = []
+        try:
+            while True:
+                row = self.queue.get()
+                if row is not _END:
+                    batch.append(row)
+                if batch and (row is _END or len(batch) >= self.batch_size):
+                    self._flush(batch)
+                    batch = []
+                if row is _END:
+                    return
+        except Exception as e:
+            self.error = e
+            # Keep draining so that producers blocked in put() are released
+            while row is not _END:
+                row = self.queue.get()
+
+    def _flush(self, batch):
+        df_batch = pd.DataFrame(batch)
+        with timed(self.timer, "write"):
+            rows_written = min(sink.write(df_batch) for sink in self.sinks)
+        self.rows_written += rows_written
+        self.batches += 1
+        if self.timer is not None:
+            self.timer.count("rows_written", rows_written)
+        if self.on_batch is not None:
+            self.on_batch(df_batch)
@@ -0,0 +1 @@
+__all__ = ["interval_metrics", "pipeline"]
\ No newline at end of file
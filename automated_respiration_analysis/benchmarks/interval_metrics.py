@@ -0,0 +1,49 @@
+import argparse
+import time
+
+import numpy as np
+from app import processing
+
+def random_intervals(num_intervals, min_len, max_len, seed):
+    """Beam-enabled amplitude intervals (mm) around a drifting breathing level"""
+    rng = np.random.default_rng(seed)
+    intervals = []
+    for length in rng.integers(min_len, max_len + 1, size=num_intervals):
+        drift = rng.uniform(-2, 2) * np.arange(length) * 0.015
+        intervals.append(5.0 + drift + rng.normal(0, 0.5, size=length))
+    return intervals
+
+def per_interval_path(intervals):
+    """Current reference path: one np.polyfit per interval"""
+    levels = [processing.avg_lvl_per_interval(intv) for intv in intervals]
+    errors = [processing.error_per_interval(intv) for intv in intervals]
+    return np.array(levels), np.array(errors)
+
+def best_of(func, intervals, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(intervals)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main(args):
+    intervals = random_intervals(args.intervals, args.min_len, args.max_len, args.seed)
+    print(f"{len(intervals)} intervals, {sum(len(i) for i in intervals)} samples")
+
+    polyfit_time, (ref_levels, ref_errors) = best_of(per_interval_path, intervals, args.repeat)
+    batched_time, (levels, errors) = best_of(processing.interval_metrics, intervals, args.repeat)
+
+    print(f"per-interval polyfit : {polyfit_time * 1e3:10.2f} ms")
+    print(f"batched closed-form  : {batched_time * 1e3:10.2f} ms ({polyfit_time / batched_time:.1f}x)")
+    print(f"max |level diff|     : {np.max(np.abs(levels - ref_levels)):.3e}")
+    print(f"max |error diff|     : {np.max(np.abs(errors - ref_errors)):.3e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-interval polyfit vs batched interval_metrics")
+    parser.add_argument('--intervals', type=int, default=10000, help='Number of beam-enabled intervals')
+    parser.add_argument('--min_len', type=int, default=7, help='Minimum samples per interval (0.1 s at 15 ms)')
+    parser.add_argument('--max_len', type=int, default=2000, help='Maximum samples per interval')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions (best is reported)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    main(parser.parse_args())
@@ -0,0 +1,131 @@
+"""
+Stage-by-stage benchmark of the analysis pipeline on a synthetic archive.
+
+    python -m benchmarks.pipeline --patients 50 --samples 20000 --json bench/$(git rev-parse --short HEAD).json
+
+Every stage is timed separately (best of --repeat); the JSON output can be diffed across commits.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from app import data_generator, dataloader, processing
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def best_of(func, repeat):
+    """(best seconds, all timings, last result)"""
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), timings, result
+
+def run_stages(root, repeat, db_config=None):
+    stages = dict()
+
+    def record(name, func):
+        best, timings, result = best_of(func, repeat)
+        stages[name] = {'seconds': round(best, 6), 'runs': [round(t, 6) for t in timings]}
+        print(f"{name:<26}: {best:10.4f} s")
+        return result
+
+    record("patient_listing", lambda: dataloader.patient_listing(root))
+    archive = record("scan_archive", lambda: dataloader.scan_archive(root))
+    fractions = [(data_type, fx_path) for data_type, patient_fractions in archive.items()
+                 for fractions in patient_fractions.values() for fx_path in fractions]
+    fields = [[field_path for field_path, _, _ in fx_fields] for patient_fractions in archive.values()
+              for fractions in patient_fractions.values() for fx_fields in fractions.values()]
+
+    parsed = record("read_field_data", lambda: [[dataloader.read_field_data(f) for f in fx_fields] for fx_fields in fields])
+    metrics = record("compute_fraction_metrics", lambda: [processing.compute_fraction_metrics(series) for series in parsed])
+    record("compute_cohort_metrics", lambda: processing.compute_cohort_metrics(parsed))
+
+    if db_config is not None:
+        from app.database_manager import DatabaseManager
+        from app.export import typed_rows
+
+        df = typed_rows(pd.DataFrame([{
+            'patient_id': fx_path.parent.name, 'data_type': data_type, 'fraction': fx_path.name,
+            'reproducibility': m[0], 'lvl_mean': m[1], 'lvl_std': m[2], 'stability': m[3], 'error_mean': m[4], 'error_std': m[5]
+        } for (data_type, fx_path), m in zip(fractions, metrics)]))
+        db_manager = DatabaseManager(db_config)
+        if not db_manager.connect():
+            raise ConnectionError("Failed to connect to the database.")
+        try:
+            record("db_insert", lambda: db_manager.insert_dataframe(df, 'analysis_results'))
+        finally:
+            db_manager.close()
+
+    archive = {
+        'fractions': len(fractions),
+        'field_files': sum(len(f) for f in fields),
+        'bytes': sum(os.path.getsize(f) for fx_fields in fields for f in fx_fields),
+        'samples': sum(len(data[0]) for series in parsed for data, _ in series)
+    }
+    return stages, archive
+
+def main(args):
+    with contextlib.ExitStack() as stack:
+        # Without --root the archive is generated in a temporary directory, removed when the benchmark ends
+        root = Path(args.root) if args.root else Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="respiration_bench_")))
+        run_benchmark(args, root)
+
+def run_benchmark(args, root):
+    if not root.exists() or not any(root.iterdir()):
+        data_generator.generate_archive(root, args.patients, args.fractions, args.fields, args.samples, seed=args.seed)
+
+    db_config = None
+    if args.db:
+        db_config = {
+            'host': os.getenv("DB_HOST", ""), 'user': os.getenv("DB_USER", ""),
+            'password': os.getenv("DB_PASSWORD", ""), 'database': os.getenv("DB_NAME", "")
+        }
+
+    stages, archive = run_stages(root, args.repeat, db_config)
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec="seconds"),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+        'params': {'patients': args.patients, 'fractions': args.fractions, 'fields': args.fields,
+                   'samples': args.samples, 'seed': args.seed, 'repeat': args.repeat, 'root': str(root)},
+        'archive': archive,
+        'stages': stages
+    }
+    print(f"{archive['field_files']} field files, {archive['bytes'] / 1e6:.1f} MB, {archive['samples']} samples")
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stage benchmark of the respiration analysis pipeline")
+    parser.add_argument('--patients', type=int, default=20, help='Synthetic patients')
+    parser.add_argument('--fractions', type=int, default=4, help='Fractions per patient')
+    parser.add_argument('--fields', type=int, default=4, help='Fields per fraction')
+    parser.add_argument('--samples', type=int, default=20000, help='Samples per field (15 ms each)')
+    parser.add_argument('--seed', type=int, default=0, help='Archive seed')
+    parser.add_argument('--root', type=str, default=None, help='Archive directory (generated if empty or missing)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions (best is reported)')
+    parser.add_argument('--db', action='store_true', help='Also time the MySQL upsert (DB_HOST/DB_USER/DB_PASSWORD/DB_NAME)')
+    parser.add_argument('--json', type=str, default=None, help='Write the results as JSON to this path')
+    main(parser.parse_args())
@@ -1 +1 @@
-__all__ = ["db_viewer_dialog", "main_window", "progress_dialog", "results_dialog"]
\ No newline at end of file
+__all__ = ["db_viewer_dialog", "jobs_dialog", "main_window", "results_dialog"]
\ No newline at end of file
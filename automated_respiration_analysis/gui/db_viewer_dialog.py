@@ -1,15 +1,16 @@
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QTableWidget, QTableWidgetItem, QLabel, QMessageBox, QHeaderView
-from PyQt5.QtCore import Qt, QThreadPool, QRunnable, pyqtSignal, pyqtSlot, QObject
-from app.database_manager import DatabaseManager
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QTableView, QLabel, QLineEdit, QMessageBox, QHeaderView
+from PyQt5.QtCore import Qt, QThreadPool, QRunnable, pyqtSignal, pyqtSlot, QObject, QAbstractTableModel, QModelIndex
+from app.database_manager import DatabaseManager, RESULT_COLUMNS, RESULT_KEY
 
 class DbViewerWorker(QRunnable):
     class Signals(QObject):
         finished = pyqtSignal(list)
         error = pyqtSignal(str)
 
-    def __init__(self, db_config):
+    def __init__(self, db_config, page_args):
         super().__init__()
         self.db_config = db_config
+        self.page_args = page_args
         self.signals = self.Signals()
 
     @pyqtSlot()
@@ -17,14 +18,112 @@ class DbViewerWorker(QRunnable):
         try:
             db_manager = DatabaseManager(self.db_config)
             if db_manager.connect():
-                data = db_manager.fetch_all_results()
-                db_manager.close()
+                try:
+                    data = db_manager.fetch_results_page(**self.page_args)
+                finally:
+                    db_manager.close()
                 self.signals.finished.emit(data)
             else:
                 self.signals.error.emit("Failed to connect to the database. Please check your credentials.")
         except Exception as e:
             self.signals.error.emit(f"An unexpected error occurred while fetching data: {e}")
 
+class ResultsTableModel(QAbstractTableModel):
+    """
+    Lazy table model over 'analysis_results'.
+    Pages are fetched in the background as the view scrolls (keyset pagination); sort and filter are applied in SQL.
+    """
+    HEADERS = ["Patient ID", "Data Type", "Fraction", "Date", "Reproducibility", "LVL Mean", "LVL STD", "Stability", "Error Mean", "Error STD"]
+
+    page_loaded = pyqtSignal()
+    error = pyqtSignal(str)
+
+    def __init__(self, db_config, page_size=200, parent=None):
+        super().__init__(parent)
+        self.db_config = db_config
+        self.page_size = page_size
+        self.threadpool = QThreadPool()
+        self.threadpool.setMaxThreadCount(1) # Pages must arrive in order
+
+        self.rows = []
+        self.order_by, self.descending = RESULT_COLUMNS[0], False
+        self.search = ""
+        self.exhausted, self.loading = False, False
+        self.generation = 0 # Bumped on sort/filter changes to drop pages of older queries
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(RESULT_COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        value = self.rows[index.row()].get(RESULT_COLUMNS[index.column()])
+        return "" if value is None else str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted and not self.loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.loading or self.exhausted:
+            return
+        after = None
+        if self.rows:
+            last = self.rows[-1]
+            sort_key = [self.order_by] + [col for col in RESULT_KEY if col != self.order_by]
+            after = tuple(last[col] for col in sort_key)
+
+        self.loading = True
+        generation = self.generation
+        worker = DbViewerWorker(self.db_config, {
+            'order_by': self.order_by, 'descending': self.descending, 'after': after,
+            'limit': self.page_size, 'search': self.search or None
+        })
+        worker.signals.finished.connect(lambda page: self.append_page(generation, page))
+        worker.signals.error.connect(lambda message: self.page_failed(generation, message))
+        self.threadpool.start(worker)
+
+    def append_page(self, generation, page):
+        if generation != self.generation:
+            return
+        self.loading = False
+        self.exhausted = len(page) < self.page_size
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
+        self.page_loaded.emit()
+
+    def page_failed(self, generation, message):
+        if generation != self.generation:
+            return
+        self.loading, self.exhausted = False, True
+        self.error.emit(message)
+
+    def reload(self):
+        """Drops the loaded rows and fetches the first page of the current query"""
+        self.generation += 1
+        self.beginResetModel()
+        self.rows = []
+        self.exhausted, self.loading = False, False
+        self.endResetModel()
+        self.fetchMore()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.order_by, self.descending = RESULT_COLUMNS[column], order == Qt.DescendingOrder
+        self.reload()
+
+    def set_search(self, text):
+        self.search = text.strip()
+        self.reload()
+
 class DbViewerDialog(QDialog):
     """
     A dialog to display database contents in a table.
@@ -34,22 +133,28 @@ class DbViewerDialog(QDialog):
         self.db_config = db_config
         self.setWindowTitle("Database Results")
         self.setMinimumSize(800, 600)
-        self.threadpool = QThreadPool()
-        
+
         self.init_ui()
         self.load_data()
 
     def init_ui(self):
         layout = QVBoxLayout()
-        self.table = QTableWidget()
-        self.table.setColumnCount(8)
-        self.table.setHorizontalHeaderLabels(["Patient ID", "Data Type", "Reproducibility", "LVL Mean", "LVL STD", "Stability", "Error Mean", "Error STD"])
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Filter by patient ID or data type (press Enter)")
+
+        self.model = ResultsTableModel(self.db_config, parent=self)
+        self.model.page_loaded.connect(self.show_table)
+        self.model.error.connect(self.handle_error)
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setEditTriggers(QTableView.NoEditTriggers)
 
         self.loading_label = QLabel("Fetching data from the database...")
         self.loading_label.setAlignment(Qt.AlignCenter)
 
+        layout.addWidget(self.search_input)
         layout.addWidget(self.loading_label)
         layout.addWidget(self.table)
         self.setLayout(layout)
@@ -58,27 +163,16 @@ class DbViewerDialog(QDialog):
         self.loading_label.show()
         self.table.hide()
 
-        worker = DbViewerWorker(self.db_config)
-        worker.signals.finished.connect(self.populate_table)
-        worker.signals.error.connect(self.handle_error)
-        self.threadpool.start(worker)
+        # Sorting by a header click re-queries the database (the first page is loaded here)
+        self.table.horizontalHeader().setSortIndicator(0, Qt.AscendingOrder)
+        self.table.setSortingEnabled(True)
+        self.search_input.returnPressed.connect(lambda: self.model.set_search(self.search_input.text()))
 
-    def populate_table(self, data):
+    def show_table(self):
         self.loading_label.hide()
         self.table.show()
-        
-        self.table.setRowCount(len(data))
-        for row, record in enumerate(data):
-            self.table.setItem(row, 0, QTableWidgetItem(str(record.get('patient_id', ''))))
-            self.table.setItem(row, 1, QTableWidgetItem(str(record.get('data_type', ''))))
-            self.table.setItem(row, 2, QTableWidgetItem(str(record.get('reproducibility', ''))))
-            self.table.setItem(row, 3, QTableWidgetItem(str(record.get('lvl_mean', ''))))
-            self.table.setItem(row, 4, QTableWidgetItem(str(record.get('lvl_std', ''))))
-            self.table.setItem(row, 5, QTableWidgetItem(str(record.get('stability', ''))))
-            self.table.setItem(row, 6, QTableWidgetItem(str(record.get('error_mean', ''))))
-            self.table.setItem(row, 7, QTableWidgetItem(str(record.get('error_std', ''))))
-            
+
     def handle_error(self, message):
         self.loading_label.hide()
         self.table.hide()
-        QMessageBox.warning(self, "Database Error", message)
\ No newline at end of file
+        QMessageBox.warning(self, "Database Error", message)
@@ -0,0 +1,79 @@
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QProgressBar, QPushButton, QHeaderView,
+    QAbstractItemView
+)
+from PyQt5.QtCore import Qt
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+class JobsDialog(QDialog):
+    """Non-modal list of the analysis jobs of a JobScheduler, with their status and progress"""
+    HEADERS = ["#", "Data Directory", "Status", "Progress", "ETA", "Message"]
+
+    def __init__(self, scheduler, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Analysis Jobs")
+        self.resize(800, 300)
+        self.scheduler = scheduler
+        self.rows = dict() # Job id -> table row
+
+        layout = QVBoxLayout()
+
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        self.cancel_button = QPushButton("Cancel Selected")
+        self.cancel_button.clicked.connect(self.cancel_selected)
+        self.cancel_all_button = QPushButton("Cancel All")
+        self.cancel_all_button.clicked.connect(self.scheduler.cancel_all)
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.hide) # Jobs keep running in the background
+        button_layout.addStretch(1)
+        button_layout.addWidget(self.cancel_button)
+        button_layout.addWidget(self.cancel_all_button)
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+        self.setLayout(layout)
+
+        self.scheduler.job_changed.connect(self.update_job)
+        for job_id in self.scheduler.jobs:
+            self.update_job(job_id)
+
+    def update_job(self, job_id):
+        job = self.scheduler.jobs[job_id]
+        if job_id not in self.rows:
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+            self.rows[job_id] = row
+            self.table.setItem(row, 0, QTableWidgetItem(str(job_id)))
+            self.table.setItem(row, 1, QTableWidgetItem(str(job.data_root)))
+            progress_bar = QProgressBar()
+            progress_bar.setRange(0, 100)
+            self.table.setCellWidget(row, 3, progress_bar)
+        row = self.rows[job_id]
+
+        self.table.setItem(row, 2, QTableWidgetItem(job.state.capitalize()))
+        eta = ""
+        if job.progress is not None:
+            self.table.cellWidget(row, 3).setValue(job.progress['percent'])
+            if job.state == "running" and job.progress['eta_seconds'] is not None:
+                eta = format_duration(job.progress['eta_seconds'])
+        self.table.setItem(row, 4, QTableWidgetItem(eta))
+        self.table.setItem(row, 5, QTableWidgetItem(job.message))
+
+    def cancel_selected(self):
+        selected = {index.row() for index in self.table.selectionModel().selectedRows()}
+        for job_id, row in self.rows.items():
+            if row in selected:
+                self.scheduler.cancel(job_id)
@@ -4,13 +4,12 @@ import os
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLineEdit, QLabel, QFileDialog, QSizePolicy,
-    QProgressBar, QGroupBox, QSpacerItem, QSizePolicy, QMessageBox
+    QProgressBar, QGroupBox, QSpacerItem, QSizePolicy, QMessageBox, QCheckBox
 )
-from PyQt5.QtCore import QThreadPool
-
-from app.analyze import AnalysisWorker
-from gui.progress_dialog import ProgressDialog
+from app.database_manager import ConnectionPool
+from app.scheduler import JobScheduler
 from gui.db_viewer_dialog import DbViewerDialog
+from gui.jobs_dialog import JobsDialog
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -18,9 +17,10 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Respiratory Analysis GUI")
         self.setGeometry(100, 100, 600, 400)
 
-        # QThreadPool to manage worker threads
-        self.threadpool = QThreadPool()
-        print(f"Multithreading with maximum {self.threadpool.maxThreadCount()} threads")
+        # Queue of analysis jobs, ANALYSIS_CONCURRENT_JOBS of them running at a time
+        self.scheduler = JobScheduler(max_concurrent=int(os.getenv("ANALYSIS_CONCURRENT_JOBS", "1")), parent=self)
+        print(f"Running up to {self.scheduler.threadpool.maxThreadCount()} analysis jobs at a time")
+        self.jobs_dialog = JobsDialog(self.scheduler, self)
         
         # UI Elements
         self.data_path = ""
@@ -76,6 +76,10 @@ class MainWindow(QMainWindow):
         db_layout.addWidget(self.db_name_input)
         db_group.setLayout(db_layout)
 
+        # Incremental mode (skip fractions analyzed by a previous run)
+        self.incremental_checkbox = QCheckBox("Only analyze new or changed fractions")
+        self.incremental_checkbox.setChecked(os.getenv("ANALYSIS_INCREMENTAL", "") == "1")
+
         # Action Buttons
         button_layout = QHBoxLayout()
         self.start_button = QPushButton("Start Analysis")
@@ -83,6 +87,11 @@ class MainWindow(QMainWindow):
         self.start_button.setFixedSize(150, 40)
         self.start_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
         
+        self.jobs_button = QPushButton("Show Jobs")
+        self.jobs_button.clicked.connect(self.show_jobs)
+        self.jobs_button.setFixedSize(150, 40)
+        self.jobs_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+
         self.view_db_button = QPushButton("View Database")
         self.view_db_button.clicked.connect(self.view_database)
         self.view_db_button.setFixedSize(150, 40)
@@ -90,12 +99,14 @@ class MainWindow(QMainWindow):
         
         button_layout.addStretch(1)
         button_layout.addWidget(self.start_button)
+        button_layout.addWidget(self.jobs_button)
         button_layout.addWidget(self.view_db_button)
         button_layout.addStretch(1)
 
         # Main Layout Assembly
         main_layout.addWidget(data_group)
         main_layout.addWidget(db_group)
+        main_layout.addWidget(self.incremental_checkbox)
         main_layout.addLayout(button_layout)
         main_layout.addStretch(1)
 
@@ -108,18 +119,22 @@ class MainWindow(QMainWindow):
             self.data_path = pathlib.Path(directory)
             self.data_path_line_edit.setText(str(self.data_path))
 
+    def db_config_from_inputs(self):
+        """DB credentials from the input fields (all analysis/viewer workers share one connection pool per config)"""
+        return {
+            'host': self.db_host_input.text().strip(),
+            'user': self.db_user_input.text().strip(),
+            'password': self.db_password_input.text(),
+            'database': self.db_name_input.text().strip()
+        }
+
     def start_analysis(self):
         # 1. Input validation
         if not self.data_path:
             QMessageBox.warning(self, "Input Error", "Please select a data directory.")
             return
 
-        db_config = {
-            'host': self.db_host_input.text().strip(),
-            'user': self.db_user_input.text().strip(),
-            'password': self.db_password_input.text(),
-            'database': self.db_name_input.text().strip()
-        }
+        db_config = self.db_config_from_inputs()
 
         # Check if database credentials are provided
         if not all(db_config.values()):
@@ -130,26 +145,24 @@ class MainWindow(QMainWindow):
         print(f"Data Path: {self.data_path}")
         print(f"DB Config: {db_config['user']}@{db_config['host']}/{db_config['database']}")
 
-        # 2. Start analysis in a worker thread
-        progress_dialog = ProgressDialog(self)
-        
-        worker = AnalysisWorker(self.data_path, db_config)
-        worker.signals.progress.connect(progress_dialog.update_progress)
-        worker.signals.status.connect(progress_dialog.update_status)
-        worker.signals.finished.connect(progress_dialog.close)
-        worker.signals.error.connect(progress_dialog.show_error)
-        worker.signals.results.connect(self.show_results)
-        
-        self.threadpool.start(worker)
-        progress_dialog.exec_()
-    
+        # 2. Queue the analysis; it runs in the background and is listed (and can be cancelled) in the jobs dialog
+        max_workers = int(os.getenv("ANALYSIS_WORKERS", "0")) or self.scheduler.workers_per_job()
+        job = self.scheduler.submit(self.data_path, db_config, max_workers=max_workers,
+                                    incremental=self.incremental_checkbox.isChecked(),
+                                    dataset_dir=os.getenv("ANALYSIS_DATASET_DIR") or None,
+                                    export_intervals=os.getenv("ANALYSIS_EXPORT_INTERVALS", "0") == "1")
+        job.worker.signals.results.connect(self.show_results)
+        job.worker.signals.timing.connect(self.show_timing)
+        print(f"Queued analysis job #{job.job_id}")
+        self.show_jobs()
+
+    def show_jobs(self):
+        self.jobs_dialog.show()
+        self.jobs_dialog.raise_()
+        self.jobs_dialog.activateWindow()
+
     def view_database(self):
-        db_config = {
-            'host': self.db_host_input.text().strip(),
-            'user': self.db_user_input.text().strip(),
-            'password': self.db_password_input.text(),
-            'database': self.db_name_input.text().strip()
-        }
+        db_config = self.db_config_from_inputs()
         
         if not all(db_config.values()):
             QMessageBox.warning(self, "Input Error", "Please provide all database credentials.")
@@ -159,5 +172,20 @@ class MainWindow(QMainWindow):
         viewer.exec_()
 
     def show_results(self, results):
-        print("Analysis finished. Results received.")
-        print(f"First 5 rows of data:\n{results.head()}")
\ No newline at end of file
+        print(f"Received a batch of {len(results)} results.")
+        print(f"First 5 rows of data:\n{results.head()}")
+
+    def show_timing(self, report):
+        print(f"Run took {report['wall_seconds']:.1f} s. Time per stage:")
+        for name, stage in report['stages'].items():
+            print(f"  {name:<16} {stage['seconds']:10.3f} s ({stage['calls']} calls)")
+        print(f"Counters: {report['counters']}")
+
+    def closeEvent(self, event):
+        # Stop queued and running jobs (between patients) before the connection pools go away
+        if self.scheduler.active_jobs():
+            print(f"Cancelling {len(self.scheduler.active_jobs())} analysis jobs...")
+        self.scheduler.cancel_all()
+        self.scheduler.wait()
+        ConnectionPool.close_all()
+        super().closeEvent(event)
\ No newline at end of file
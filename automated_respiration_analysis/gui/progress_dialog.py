@@ -1,35 +0,0 @@
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QProgressBar, QLabel
-from PyQt5.QtCore import Qt
-
-class ProgressDialog(QDialog):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("Analysis in Progress")
-        self.setFixedSize(400, 150)
-        self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.CustomizeWindowHint | Qt.WindowCloseButtonHint)
-        
-        layout = QVBoxLayout()
-        
-        # Status Label
-        self.status_label = QLabel("Initializing analysis...")
-        self.status_label.setAlignment(Qt.AlignCenter)
-        layout.addWidget(self.status_label)
-        
-        # Progress Bar
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setRange(0, 100)
-        self.progress_bar.setValue(0)
-        layout.addWidget(self.progress_bar)
-
-        self.setLayout(layout)
-
-    def update_progress(self, value):
-        self.progress_bar.setValue(value)
-
-    def update_status(self, message):
-        self.status_label.setText(message)
-
-    def show_error(self, message):
-        self.setWindowTitle("Error")
-        self.status_label.setText(f"Error: {message}")
-        self.progress_bar.hide()
\ No newline at end of file
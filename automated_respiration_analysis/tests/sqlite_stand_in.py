@@ -0,0 +1,84 @@
+"""
+In-memory SQLite stand-in for the MySQL connection of DatabaseManager (no server is needed for the tests).
+Translates the MySQL dialect the writers and the viewer use (%s parameters, ON DUPLICATE KEY UPDATE, inline INDEX
+definitions) and raises mysql.connector.Error like the connector. NULLs sort first in both engines.
+"""
+import datetime
+import re
+import sqlite3
+
+import mysql.connector
+
+from app.database_manager import DatabaseManager, INTERVALS_TABLE, RESULTS_TABLE
+
+sqlite3.register_adapter(datetime.date, datetime.date.isoformat)
+sqlite3.register_converter("DATE", lambda value: datetime.date.fromisoformat(value.decode()))
+
+def translate(query):
+    query = query.replace("%s", "?")
+    # ON DUPLICATE KEY UPDATE c=VALUES(c) -> ON CONFLICT DO UPDATE SET c=excluded.c
+    upsert = re.search(r"ON DUPLICATE KEY UPDATE (.*)$", query, re.S)
+    if upsert:
+        assignments = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", upsert.group(1))
+        query = query[:upsert.start()] + f"ON CONFLICT DO UPDATE SET {assignments}"
+    # SQLite has no inline secondary indexes (they do not change results)
+    return re.sub(r",\s*INDEX \w+ \([^)]*\)", "", query)
+
+class StandInCursor:
+    def __init__(self, connection, dictionary):
+        self.cursor, self.dictionary = connection.cursor(), dictionary
+
+    def _run(self, method, query, params):
+        try:
+            method(translate(query), params)
+        except sqlite3.Error as err:
+            raise mysql.connector.Error(str(err)) from err
+
+    def execute(self, query, params=()):
+        self._run(self.cursor.execute, query, params)
+
+    def executemany(self, query, seq_params):
+        self._run(self.cursor.executemany, query, seq_params)
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        if self.dictionary:
+            names = [column[0] for column in self.cursor.description]
+            return [dict(zip(names, row)) for row in rows]
+        return rows
+
+    def close(self):
+        self.cursor.close()
+
+class StandInConnection:
+    """Counts commits and rollbacks, like a recording connection"""
+    def __init__(self):
+        self.db = sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES)
+        self.commits = self.rollbacks = 0
+
+    def cursor(self, dictionary=False):
+        return StandInCursor(self.db, dictionary)
+
+    def commit(self):
+        self.commits += 1
+        self.db.commit()
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.db.rollback()
+
+    def query(self, sql, params=()):
+        return self.db.execute(sql, params).fetchall()
+
+def stand_in_manager():
+    """DatabaseManager connected to an empty stand-in holding the result and interval tables"""
+    connection = StandInConnection()
+    for table in (RESULTS_TABLE, INTERVALS_TABLE):
+        connection.db.execute(translate(table))
+    db_manager = DatabaseManager({})
+    db_manager.cnx = connection
+    return db_manager
@@ -0,0 +1,25 @@
+import json
+
+from app import cli
+
+class RecordingSink:
+    destination = "recording://"
+
+    def __init__(self):
+        self.closed = False
+
+    def write(self, df):
+        return len(df)
+
+    def close(self):
+        self.closed = True
+
+def test_sinks_are_closed_when_setup_fails(tmp_path, monkeypatch, capsys):
+    sinks = []
+    monkeypatch.setattr(cli, "file_sink", lambda path: sinks.append(RecordingSink()) or sinks[-1])
+    # --intervals without an interval destination fails after the file sink is opened, before run_analysis
+    exit_code = cli.main(["analyze", "--root", str(tmp_path), "--out", str(tmp_path / "results.csv"), "--intervals"])
+
+    summary = json.loads(capsys.readouterr().out)
+    assert exit_code == 1 and summary['status'] == 'error' and "--intervals" in summary['error']
+    assert len(sinks) == 1 and sinks[0].closed
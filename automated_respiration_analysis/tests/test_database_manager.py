@@ -0,0 +1,292 @@
+import datetime
+import random
+import re
+
+import mysql.connector
+import pandas as pd
+from mysql.connector import pooling
+from mysql.connector.connection import MySQLConnection
+import pytest
+
+from app.database_manager import (LEGACY_TABLE, ConnectionPool, METRIC_COLUMNS, RESULT_COLUMNS, RESULT_KEY, DatabaseManager,
+                                  SCHEMA_VERSION, connect_managers)
+from tests.sqlite_stand_in import stand_in_manager
+
+V1_COLUMNS = {"patient_id", "data_type", *METRIC_COLUMNS}
+
+class FakeServer:
+    """
+    Schema state of a MySQL database as seen by create_results_table: tables, columns, primary key and indexes of
+    'analysis_results', the schema version and the patient ids of rows without a fraction. DDL errors like MySQL's.
+    """
+    def __init__(self, tables=(), columns=(), primary=(), legacy_rows=(), version=None):
+        self.tables, self.columns, self.primary = set(tables), set(columns), list(primary)
+        self.indexes, self.version = set(), version
+        self.rows, self.archive = set(legacy_rows), set()
+        self.statements, self.fail_on = [], None
+
+    def execute(self, query, params=()):
+        query = " ".join(query.split())
+        self.statements.append(query)
+        if self.fail_on and self.fail_on in query:
+            self.fail_on = None
+            raise mysql.connector.Error("Lost connection to MySQL server during query")
+        if query.startswith("SELECT MAX(version)"):
+            return [(self.version,)]
+        if query.startswith("SHOW TABLES LIKE"):
+            return [(name,) for name in self.tables if name == query.split("'")[1]]
+        if "INFORMATION_SCHEMA.COLUMNS" in query:
+            return [(int(re.search(r"COLUMN_NAME = '(\w+)'", query).group(1) in self.columns),)]
+        if "INFORMATION_SCHEMA.STATISTICS" in query:
+            index = re.search(r"INDEX_NAME = '(\w+)'", query).group(1)
+            return [(int("fraction" in self.primary if index == "PRIMARY" else index in self.indexes),)]
+        if query.startswith("CREATE TABLE IF NOT EXISTS"):
+            self.tables.add(query.split()[5].rstrip("("))
+            if "analysis_results (" in query:
+                self.columns |= V1_COLUMNS | {"fraction", "date"}
+                self.primary = ["patient_id", "data_type", "fraction"]
+        for column in re.findall(r"ADD COLUMN (\w+)", query):
+            if column in self.columns:
+                raise mysql.connector.Error(f"Duplicate column name '{column}'")
+            self.columns.add(column)
+        if "ADD PRIMARY KEY" in query:
+            self.primary = [name.strip() for name in re.search(r"ADD PRIMARY KEY \(([^)]*)\)", query).group(1).split(",")]
+        for index in re.findall(r"ADD INDEX (\w+)", query):
+            if index in self.indexes:
+                raise mysql.connector.Error(f"Duplicate key name '{index}'")
+            self.indexes.add(index)
+        if query.startswith(f"INSERT IGNORE INTO {LEGACY_TABLE}"):
+            self.archive |= self.rows
+        if query.startswith("DELETE FROM analysis_results WHERE fraction = 0"):
+            assert self.rows <= self.archive, "legacy rows deleted before being archived"
+            self.rows = set()
+        if query.startswith("INSERT INTO schema_version"):
+            self.version = params[0]
+        return []
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server, self.result = server, []
+
+    def execute(self, query, params=()):
+        self.result = self.server.execute(query, params)
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+
+    def cursor(self):
+        return FakeCursor(self.server)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+def create_tables(server):
+    db_manager = DatabaseManager({})
+    db_manager.cnx = FakeConnection(server)
+    return db_manager.create_results_table()
+
+def v1_server():
+    return FakeServer(tables={"analysis_results"}, columns=V1_COLUMNS, primary=["patient_id"], legacy_rows={"P1", "P2"})
+
+def assert_migrated(server):
+    assert server.version == SCHEMA_VERSION
+    assert {"fraction", "date"} <= server.columns
+    assert server.primary == ["patient_id", "data_type", "fraction"]
+    assert server.indexes == {"idx_results_type_date", "idx_results_date"}
+    assert {"analysis_intervals", LEGACY_TABLE} <= server.tables
+    assert server.rows == set() and server.archive == {"P1", "P2"}
+
+def test_fresh_database_creates_tables():
+    server = FakeServer()
+    assert create_tables(server)
+    assert {"schema_version", "analysis_results", "analysis_intervals"} <= server.tables
+    assert server.version == SCHEMA_VERSION
+    assert not any(statement.startswith("ALTER") for statement in server.statements)
+
+def test_current_database_is_left_alone():
+    server = FakeServer(tables={"analysis_results"}, columns=V1_COLUMNS | {"fraction", "date"}, version=SCHEMA_VERSION)
+    assert create_tables(server)
+    assert not any(statement.startswith(("ALTER", "DELETE", "INSERT")) for statement in server.statements)
+
+def test_v1_database_is_migrated_and_legacy_rows_archived():
+    server = v1_server()
+    assert create_tables(server)
+    assert_migrated(server)
+
+@pytest.mark.parametrize("failing_step", [
+    "ADD COLUMN date", # After ADD COLUMN fraction was committed
+    "DELETE FROM analysis_results WHERE fraction = 0", # After the legacy rows were archived
+    "ADD PRIMARY KEY",
+    "ADD INDEX idx_results_date"
+])
+def test_interrupted_migration_resumes(failing_step):
+    server = v1_server()
+    server.fail_on = failing_step
+    assert not create_tables(server)
+    assert server.version is None # Not recorded: the next connection migrates again
+
+    assert create_tables(server) # No "Duplicate column" / "Duplicate key name" on the second run
+    assert_migrated(server)
+    assert sum("ADD COLUMN fraction" in statement for statement in server.statements) == 1
+
+def result_frame(count, value=1.0):
+    return pd.DataFrame([{'patient_id': f"P{index:03d}", 'data_type': "Breathing", 'fraction': 1,
+                          'date': datetime.date(2026, 6, 28), **{col: value for col in METRIC_COLUMNS}}
+                         for index in range(count)], columns=RESULT_COLUMNS)
+
+def stored_rows(db_manager):
+    return db_manager.cnx.query("SELECT patient_id, lvl_mean FROM analysis_results ORDER BY patient_id")
+
+@pytest.mark.parametrize("count, chunks", [(0, 0), (4, 1), (5, 2)]) # Empty, exactly one chunk, one row over
+def test_insert_dataframe_chunks(count, chunks):
+    db_manager = stand_in_manager()
+    stats = db_manager.insert_dataframe(result_frame(count), "analysis_results", chunk_size=4)
+    assert (stats['rows'], stats['affected_rows'], stats['chunks']) == (count, count, chunks)
+    assert stats['seconds'] >= 0
+    assert db_manager.cnx.commits == chunks # One transaction per chunk
+    assert stored_rows(db_manager) == [(f"P{index:03d}", 1.0) for index in range(count)]
+
+def test_insert_dataframe_updates_existing_rows():
+    db_manager = stand_in_manager()
+    db_manager.insert_dataframe(result_frame(3), "analysis_results", chunk_size=2)
+    stats = db_manager.insert_dataframe(result_frame(5, value=2.0), "analysis_results", chunk_size=2)
+    assert (stats['rows'], stats['chunks']) == (5, 3)
+    assert stored_rows(db_manager) == [(f"P{index:03d}", 2.0) for index in range(5)]
+
+def test_insert_dataframe_rolls_back_failing_chunk():
+    df = result_frame(6)
+    df.loc[3, 'patient_id'] = None # NOT NULL: fails within the second chunk, after its first row was sent
+    db_manager = stand_in_manager()
+    stats = db_manager.insert_dataframe(df, "analysis_results", chunk_size=2)
+    assert (stats['rows'], stats['chunks']) == (2, 1)
+    assert (db_manager.cnx.commits, db_manager.cnx.rollbacks) == (1, 1)
+    assert stored_rows(db_manager) == [("P000", 1.0), ("P001", 1.0)] # The committed chunk is kept
+
+def paging_frame():
+    # Ties in every sort column, undated patients (NULL) and both data types
+    rng = random.Random(3)
+    rows = [{'patient_id': patient_id, 'data_type': data_type, 'fraction': fraction,
+             'date': None if patient_id.startswith("Nodate") else datetime.date(2026, 6, rng.randint(1, 3)),
+             **{col: rng.choice([0.25, 0.5, None]) if col == 'error_std' else rng.choice([0.25, 0.5, 1.0])
+                for col in METRIC_COLUMNS}}
+            for patient_id in ["P1_260601_01", "P2_260602_01", "P10_260603_01", "Nodate", "Nodate_b"]
+            for data_type in ["Breathing", "Static"]
+            for fraction in [1, 2, 3]]
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+def fetch_pages(db_manager, order_by, descending, search=None, limit=4):
+    """Every page in turn, continuing after the sort key of the last row like the viewer does"""
+    sort_key = [order_by] + [col for col in RESULT_KEY if col != order_by]
+    rows, after = [], None
+    while True:
+        page = db_manager.fetch_results_page(order_by, descending, after, limit, search)
+        assert len(page) <= limit
+        rows += page
+        if len(page) < limit:
+            return rows
+        after = tuple(page[-1][col] for col in sort_key)
+
+def expected_order(df, order_by, descending, search=None):
+    rows = df.astype(object).where(df.notna(), None).to_dict('records')
+    if search:
+        rows = [row for row in rows if search.lower() in (row['patient_id'] + row['data_type']).lower()]
+    # NULLs first ascending, last descending; ties broken by the primary key in the same direction
+    return sorted(rows, key=lambda row: ((row[order_by] is not None, row[order_by]),
+                                         *(row[col] for col in RESULT_KEY)), reverse=descending)
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("order_by", RESULT_COLUMNS)
+def test_pages_cover_every_row_once(order_by, descending):
+    df = paging_frame()
+    db_manager = stand_in_manager()
+    db_manager.insert_dataframe(df, "analysis_results")
+
+    rows = fetch_pages(db_manager, order_by, descending)
+    keys = [tuple(row[col] for col in RESULT_KEY) for row in rows]
+    assert len(keys) == len(set(keys)) == len(df) # No duplicates, no gaps
+    assert rows == expected_order(df, order_by, descending)
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("order_by, search", [("date", "nodate"), ("date", "static"), ("lvl_mean", "P1"),
+                                              ("patient_id", "_26"), ("error_std", "missing")])
+def test_search_with_paging(order_by, search, descending):
+    df = paging_frame()
+    db_manager = stand_in_manager()
+    db_manager.insert_dataframe(df, "analysis_results")
+
+    assert fetch_pages(db_manager, order_by, descending, search, limit=3) == expected_order(df, order_by, descending,
+                                                                                            search)
+
+def test_unknown_sort_column_is_rejected():
+    with pytest.raises(ValueError):
+        stand_in_manager().fetch_results_page(order_by="patient_id; DROP TABLE analysis_results")
+
+class OfflineConnection(MySQLConnection):
+    """MySQL connection that never reaches a server: always connected until disconnect()"""
+    def __init__(self):
+        super().__init__()
+        self.disconnected = False
+
+    def is_connected(self):
+        return not self.disconnected
+
+    def config(self, **kwargs):
+        pass
+
+    def reconnect(self, attempts=1, delay=0):
+        if self.disconnected:
+            raise mysql.connector.InterfaceError("Can not reconnect")
+
+    def reset_session(self, user_variables=None, session_variables=None):
+        pass
+
+    def disconnect(self):
+        self.disconnected = True
+
+class OfflinePool(pooling.MySQLConnectionPool):
+    def __init__(self, pool_name, pool_size, **config):
+        super().__init__(pool_name=pool_name, pool_size=pool_size)
+        self.set_config(**config)
+        self.connections = [OfflineConnection() for _ in range(pool_size)]
+        for cnx in self.connections:
+            self.add_connection(cnx)
+
+def test_close_all_disconnects_idle_connections(monkeypatch):
+    monkeypatch.setattr(pooling, "MySQLConnectionPool", OfflinePool)
+    monkeypatch.setattr(ConnectionPool, "_pools", dict())
+    pool = ConnectionPool.for_config({'host': "db", 'user': "u", 'password': "p", 'database': "d", 'pool_size': 3})
+    assert ConnectionPool.for_config({'host': "db", 'user': "u", 'password': "p", 'database': "d", 'pool_size': 3}) is pool
+    idle, borrowed = pool.acquire(), pool.acquire()
+    idle.close() # Back to the pool
+
+    ConnectionPool.close_all()
+    assert ConnectionPool._pools == dict()
+    with pytest.raises(pooling.PoolError): # Every idle connection was taken out of the pool and disconnected
+        pool.pool.get_connection()
+    assert sum(cnx.disconnected for cnx in pool.pool.connections) == 2
+    assert borrowed.is_connected() # Still usable by its borrower
+    assert pool.snapshot()['acquired'] == 2
+
+def test_failed_connection_closes_connected_managers(monkeypatch):
+    connected, closed = [], []
+    monkeypatch.setattr(DatabaseManager, "connect", lambda self: connected.append(self) or len(connected) < 2)
+    monkeypatch.setattr(DatabaseManager, "close", lambda self: closed.append(self))
+
+    assert len(connect_managers({})) == 1 and closed == []
+    connected.clear()
+    with pytest.raises(ConnectionError):
+        connect_managers({}, with_intervals=True) # Intervals connection fails
+    assert closed == connected and len(closed) == 2
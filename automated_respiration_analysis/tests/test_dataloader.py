@@ -0,0 +1,99 @@
+import random
+
+import numpy as np
+import pytest
+
+from app import dataloader
+from app.data_generator import field_file_content, generate_archive, generate_random_data
+from tests import baseline
+
+def assert_same_field(field_path):
+    (times, amps), (beam_times, beam_states) = dataloader.read_field_data(field_path)
+    (ref_times, ref_amps), (ref_beam_times, ref_beam_states) = baseline.read_field_data(field_path)
+    np.testing.assert_array_equal(times, np.array(ref_times, dtype=np.float64))
+    np.testing.assert_array_equal(amps, np.array(ref_amps, dtype=np.float64))
+    np.testing.assert_array_equal(beam_times, np.array(ref_beam_times, dtype=np.float64))
+    np.testing.assert_array_equal(beam_states, np.array(ref_beam_states, dtype=np.int8))
+
+def write_field(tmp_path, content, newline="\n"):
+    field_path = tmp_path / "field.txt"
+    with open(field_path, "w", newline=newline) as file:
+        file.write(content)
+    return field_path
+
+def test_random_archive_matches_baseline(tmp_path):
+    random.seed(0)
+    generate_random_data(tmp_path, 6)
+    field_paths = sorted(tmp_path.rglob("field*.txt"))
+    assert len(field_paths) == 6 * 4 * 4
+    for field_path in field_paths:
+        assert_same_field(field_path)
+
+def test_breathing_archive_matches_baseline(tmp_path):
+    generate_archive(tmp_path, 2, num_fractions=2, num_fields=2, samples_per_field=2000, seed=1)
+    for field_path in sorted(tmp_path.rglob("field*.txt")):
+        assert_same_field(field_path)
+
+def test_crlf_line_endings(tmp_path):
+    content = field_file_content("0.000\t0.512\n0.015\t0.498", "0.10\t1\n0.40\t0")
+    assert_same_field(write_field(tmp_path, content, newline="\r\n"))
+
+@pytest.mark.parametrize("content", [
+    # "Amplitude Data" title after the 4th THICK banner but before the thin banner
+    "=============\n=============\n=============\n=============\nAmplitude Data\n-------------\nTime\tAmplitude\n0.0\t0.5\n0.015\t0.6\n\n"
+    "=============\n=============\n-------------\nTime\tState\n0.1\t1\n0.2\t0\n\n",
+    # Data section without the blank line (ends at the next thin banner)
+    "=============\n=============\n=============\n=============\n-------------\nTime\tAmplitude\n0.0\t0.5\n"
+    "-------------\n=============\n=============\nTime\tState\n0.1\t1\n0.2\t0",
+    # Two amplitude blocks in the same thin section
+    "=============\n=============\n=============\n=============\n-------------\nTime\tAmplitude\n0.0\t0.5\n\n"
+    "Amplitude (continued)\n0.015\t0.7\n\n=============\n=============\nTime\tState\n0.1\t1\n",
+    # Header immediately followed by a blank line, no beam section
+    "=============\n=============\n=============\n=============\n-------------\nTime\tAmplitude\n\n",
+    # Second thin banner before the 4th THICK banner: no amplitude data
+    "-------------\n-------------\n=============\n=============\n=============\n=============\nAmplitude\n0.0\t0.5\n",
+    # No trailing newline after the last beam row
+    field_file_content("0.000\t0.512", "0.10\t1\n0.40\t0").rstrip(),
+    # Empty file
+    "",
+])
+def test_header_layouts(tmp_path, content):
+    assert_same_field(write_field(tmp_path, content))
+
+@pytest.mark.parametrize("amplitude_rows, beam_rows", [
+    ("0.000\t0.512\n0.015 0.498", "0.10\t1"), # Space instead of tab
+    ("0.000\t0.512\n0.015\tabc", "0.10\t1"), # Non-numeric value
+    ("0.000\t0.512\n0.015", "0.10\t1"), # Missing column
+    ("0.000\t0.512\n0.015\t0.4\t0.1", "0.10\t1"), # Extra column
+    ("0.000\t0.512\n \n0.015\t0.4", "0.10\t1"), # Whitespace-only line
+    ("0.000\t0.512", "0.10\t1\n0.40\tx"), # Malformed beam row
+])
+def test_malformed_rows_raise(tmp_path, amplitude_rows, beam_rows):
+    field_path = write_field(tmp_path, field_file_content(amplitude_rows, beam_rows))
+    with pytest.raises(ValueError):
+        baseline.read_field_data(field_path)
+    with pytest.raises(ValueError):
+        dataloader.read_field_data(field_path)
+
+def test_parse_field_text_accepts_str_and_bytes(tmp_path):
+    content = field_file_content("0.000\t0.512\n0.015\t0.498", "0.10\t1\n0.40\t0")
+    (times, amps), (beam_times, beam_states) = dataloader.parse_field_text(content)
+    (times_b, _), _ = dataloader.parse_field_text(content.encode())
+    np.testing.assert_array_equal(times, times_b)
+    np.testing.assert_array_equal(amps, [5.12, 4.98])
+    np.testing.assert_array_equal(beam_states, [1, 0])
+
+def test_file_closed_when_mapping_fails(tmp_path, monkeypatch):
+    field_path = write_field(tmp_path, field_file_content("0.000\t0.512", "0.10\t1"))
+    opened = []
+    real_open = open
+    def tracking_open(*args, **kwargs):
+        opened.append(real_open(*args, **kwargs))
+        return opened[-1]
+    def failing_mmap(*args, **kwargs):
+        raise OSError("cannot map")
+    monkeypatch.setattr("builtins.open", tracking_open)
+    monkeypatch.setattr(dataloader.mmap, "mmap", failing_mmap)
+    with pytest.raises(OSError):
+        dataloader.read_field_data(field_path)
+    assert opened and opened[0].closed
@@ -0,0 +1,124 @@
+import random
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from app import dataloader, engine
+from app.data_generator import generate_random_data
+from app.database_manager import METRIC_COLUMNS
+from app.engine import AnalysisEngine
+from tests import baseline
+from tests.test_processing import patient_paths
+
+class ScriptedExecutor:
+    """
+    ProcessPoolExecutor stand-in: a submitted job only runs (in this process) when wait() completes it, latest
+    submitted first, so jobs finish out of archive order. Records every submission and the shutdown arguments.
+    """
+    def __init__(self, max_workers=None, mp_context=None):
+        self.jobs = dict() # Future -> (function, args)
+        self.submitted, self.in_flight, self.shutdown_args = [], [], None
+
+    def submit(self, function, *args):
+        future = Future()
+        self.jobs[future] = (function, args)
+        self.submitted.append(args[1].name)
+        return future
+
+    def wait(self, futures, timeout=None, return_when=None):
+        self.in_flight.append(len(futures))
+        future = list(futures)[-1]
+        function, args = self.jobs[future]
+        future.set_result(function(*args))
+        return {future}, set(futures) - {future}
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdown_args = (wait, cancel_futures)
+        if cancel_futures:
+            for future in self.jobs:
+                future.cancel()
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = ScriptedExecutor()
+    monkeypatch.setattr(engine, "ProcessPoolExecutor", lambda max_workers, mp_context: executor)
+    monkeypatch.setattr(engine, "wait", executor.wait)
+    return executor
+
+@pytest.fixture(scope="module")
+def archive(tmp_path_factory):
+    data_root = tmp_path_factory.mktemp("data")
+    random.seed(2)
+    generate_random_data(data_root, 6)
+    return dataloader.scan_archive(data_root)
+
+def archive_patients(archive):
+    return [patient_path.name for patient_fractions in archive.values() for patient_path in patient_fractions]
+
+def cancel_after(cancel_event, patients):
+    """Status callback that cancels the run once `patients` patients are analyzed"""
+    def status(message):
+        if message.startswith("Analyzed patient") and message.endswith(f"({patients}/{message.split('/')[-1]}"):
+            cancel_event.set()
+    return status
+
+def test_cancelled_run_stops_submitting(archive, executor):
+    cancel_event, rows = threading.Event(), []
+    analysis_engine = AnalysisEngine(max_workers=2, window=2)
+    analysis_engine.run(archive, status_callback=cancel_after(cancel_event, 1), row_callback=rows.append,
+                        cancel_event=cancel_event)
+
+    patients = archive_patients(archive)
+    assert analysis_engine.cancelled
+    assert executor.submitted == patients[:2] # Nothing submitted once cancelled
+    assert executor.shutdown_args == (False, True) # Queued jobs dropped, running ones not waited for
+    # The second patient finished first: its rows are still released, with their fractions
+    assert {row['patient_id'] for row in rows} == {patients[1]}
+    assert set(analysis_engine.fingerprints) == {fx_path for patient_fractions in archive.values()
+                                                 for patient_path, fractions in patient_fractions.items()
+                                                 if patient_path.name == patients[1] for fx_path in fractions}
+
+def test_cancelled_serial_run(archive):
+    cancel_event = threading.Event()
+    analysis_engine = AnalysisEngine(max_workers=1)
+    rows = analysis_engine.run(archive, status_callback=cancel_after(cancel_event, 2), cancel_event=cancel_event)
+    assert analysis_engine.cancelled
+    assert [row['patient_id'] for row in rows] == [patient for patient in archive_patients(archive)[:2]
+                                                   for _ in range(4)]
+
+def test_finished_run_shuts_pool_down(archive, executor):
+    analysis_engine = AnalysisEngine(max_workers=2)
+    analysis_engine.run(archive, status_callback=lambda message: None, cancel_event=threading.Event())
+    assert not analysis_engine.cancelled
+    assert executor.submitted == archive_patients(archive)
+    assert executor.shutdown_args == (True, False)
+
+@pytest.mark.parametrize("window", [1, 2, 3])
+def test_streamed_rows_keep_archive_order(archive, executor, window):
+    rows = []
+    AnalysisEngine(max_workers=2, window=window).run(archive, status_callback=lambda message: None,
+                                                     row_callback=rows.append)
+    expected = AnalysisEngine(max_workers=1).run(archive, status_callback=lambda message: None)
+    assert rows == expected # Although every job finished after the ones submitted later
+    assert max(executor.in_flight) == window # At most `window` jobs past the next rows to release
+
+def test_collected_rows_keep_archive_order(archive, executor):
+    rows = AnalysisEngine(max_workers=2).run(archive, status_callback=lambda message: None)
+    assert rows == AnalysisEngine(max_workers=1).run(archive, status_callback=lambda message: None)
+    assert executor.in_flight[0] == len(archive_patients(archive)) # Not streamed: no window
+
+def test_parallel_run_matches_serial_and_baseline(tmp_path):
+    random.seed(7) # The archive of test_random_archive_matches_baseline, on a real process pool
+    generate_random_data(tmp_path, 60)
+    archive = dataloader.scan_archive(tmp_path)
+
+    parallel = AnalysisEngine(max_workers=2).run(archive, status_callback=lambda message: None)
+    assert parallel == AnalysisEngine(max_workers=1).run(archive, status_callback=lambda message: None)
+
+    ref_results = baseline.batch_processing(patient_paths(tmp_path))
+    assert [(row['patient_id'], row['fraction']) for row in parallel] == [
+        (patient_path.name, fx_path.name) for patient_fractions in archive.values()
+        for patient_path, fractions in patient_fractions.items() for fx_path in fractions]
+    for row in parallel:
+        assert tuple(row[col] for col in METRIC_COLUMNS) == tuple(ref_results[row['patient_id']][row['fraction']])
@@ -0,0 +1,43 @@
+import datetime
+
+import pandas as pd
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+
+from app.export import ParquetDatasetSink, ParquetSink, dataset_schema
+
+def result_rows(patient_fractions, value):
+    return pd.DataFrame([{'patient_id': patient_id, 'data_type': 'STATIC', 'fraction': str(fraction),
+                          'reproducibility': value, 'lvl_mean': value, 'lvl_std': value,
+                          'stability': value, 'error_mean': value, 'error_std': value}
+                         for patient_id, fraction in patient_fractions])
+
+def read_dataset(root_dir):
+    table = pads.dataset(root_dir, schema=dataset_schema("results"), partitioning="hive").to_table()
+    return table.to_pandas().sort_values(['patient_id', 'fraction']).reset_index(drop=True)
+
+def test_rerun_replaces_earlier_rows(tmp_path):
+    root_dir = tmp_path / "results"
+    first = [("P1_260628_01", 1), ("P1_260628_01", 2), ("P2_260628_01", 1), ("Nodate", 1)]
+    sink = ParquetDatasetSink(root_dir)
+    sink.write(result_rows(first[:2], 1.0))
+    sink.write(result_rows(first[2:], 1.0))
+
+    # Second run re-analyzes one fraction of P1 and the undated patient only
+    ParquetDatasetSink(root_dir).write(result_rows([("P1_260628_01", 2), ("Nodate", 1)], 2.0))
+
+    df = read_dataset(root_dir)
+    assert list(zip(df['patient_id'], df['fraction'])) == [("Nodate", 1), ("P1_260628_01", 1), ("P1_260628_01", 2),
+                                                            ("P2_260628_01", 1)]
+    assert df['lvl_mean'].tolist() == [2.0, 1.0, 2.0, 1.0]
+
+def test_parquet_file_is_typed(tmp_path):
+    sink = ParquetSink(tmp_path / "results.parquet")
+    sink.write(result_rows([("P1_260628_01", 2)], 1.0))
+    sink.write(result_rows([("Nodate", 1)], 2.0))
+    sink.close()
+
+    table = pq.read_table(tmp_path / "results.parquet")
+    assert table.schema == dataset_schema("results")
+    assert table['fraction'].to_pylist() == [2, 1]
+    assert table['date'].to_pylist() == [datetime.date(2026, 6, 28), None]
@@ -0,0 +1,47 @@
+import os
+import random
+import time
+
+from app import processing
+from app.data_generator import generate_random_data
+from app.field_cache import FieldCache
+
+def cached_fractions(tmp_path, num_patients):
+    random.seed(0)
+    generate_random_data(tmp_path / "data", num_patients)
+    cache = FieldCache(tmp_path / "cache")
+    for patient_path in sorted((tmp_path / "data").glob("*/*")):
+        for fx_path in processing.list_fractions(patient_path):
+            cache.load_fraction(fx_path, processing.list_fields(fx_path))
+    return cache
+
+def test_prune_removes_unused_bundles(tmp_path):
+    cache = cached_fractions(tmp_path, 2)
+    bundles = sorted(cache.bundles())
+    assert len(bundles) == 8
+    old = time.time() - 40 * 86400
+    for bundle_path, _, _ in bundles[:3]:
+        os.utime(bundle_path, (old, old))
+    assert cache.prune(max_age_days=30) == 3
+    assert len(cache.bundles()) == 5
+
+def test_prune_keeps_most_recently_used_within_size(tmp_path):
+    cache = cached_fractions(tmp_path, 2)
+    bundles = sorted(cache.bundles())
+    for i, (bundle_path, _, _) in enumerate(bundles):
+        os.utime(bundle_path, (time.time() - i, time.time() - i))
+    size = bundles[0][2] + bundles[1][2]
+    cache.prune(max_age_days=0, max_mb=size / 1e6)
+    assert sorted(path for path, _, _ in cache.bundles()) == [bundles[0][0], bundles[1][0]]
+
+def test_hit_refreshes_last_use_and_clear(tmp_path):
+    cache = cached_fractions(tmp_path, 1)
+    fx_path = processing.list_fractions(next((tmp_path / "data").glob("*/*")))[0]
+    bundle_path = cache.bundle_path(fx_path)
+    old = time.time() - 40 * 86400
+    os.utime(bundle_path, (old, old))
+    cache.load_fraction(fx_path, processing.list_fields(fx_path))
+    assert cache.hits == 1 and time.time() - bundle_path.stat().st_mtime < 60
+    (cache.cache_dir / "manifest_x.json").write_text("{}")
+    assert cache.clear() == 4
+    assert cache.bundles() == [] and (cache.cache_dir / "manifest_x.json").exists()
@@ -0,0 +1,28 @@
+import random
+
+from app import pipeline
+from app.data_generator import generate_random_data
+from app.export import CsvSink
+from app.incremental import ProcessedManifest
+
+def run(data_root, cache_dir, *out_paths):
+    return pipeline.run_analysis(data_root, [CsvSink(path) for path in out_paths], max_workers=1, cache_dir=cache_dir,
+                                 incremental=True, status_callback=lambda message: None)
+
+def test_manifest_is_per_destination(tmp_path):
+    random.seed(0)
+    generate_random_data(tmp_path / "data", 2)
+    cache_dir = tmp_path / "cache"
+
+    first = run(tmp_path / "data", cache_dir, tmp_path / "a.csv")
+    assert first['fractions_analyzed'] == 8 and first['fractions_skipped'] == 0
+    assert run(tmp_path / "data", cache_dir, tmp_path / "a.csv")['fractions_skipped'] == 8
+    # Another destination has received nothing yet
+    other = run(tmp_path / "data", cache_dir, tmp_path / "b.csv")
+    assert other['fractions_analyzed'] == 8 and other['fractions_skipped'] == 0
+
+def test_manifest_key_ignores_destination_order(tmp_path):
+    first = ProcessedManifest(tmp_path, tmp_path / "cache", ["csv:///a.csv", "mysql://db:3306/x/analysis_results"])
+    second = ProcessedManifest(tmp_path, tmp_path / "cache", ["mysql://db:3306/x/analysis_results", "csv:///a.csv"])
+    assert first.path == second.path
+    assert first.path != ProcessedManifest(tmp_path, tmp_path / "cache", ["csv:///a.csv"]).path
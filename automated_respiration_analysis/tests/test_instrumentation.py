@@ -0,0 +1,79 @@
+import json
+import random
+
+import pytest
+
+from app import instrumentation, pipeline, processing
+from app.data_generator import generate_random_data
+from app.engine import analyze_fractions
+from app.export import CsvSink
+from app.instrumentation import StageTimer, profiling, timed
+from tests.test_processing import patient_paths
+
+def test_stage_totals_are_recorded():
+    timer = StageTimer()
+    for _ in range(3):
+        with timer.stage("parse"):
+            pass
+    with pytest.raises(ValueError):
+        with timer.stage("write"): # Failed stages count too
+            raise ValueError
+    timer.count("rows_written", 5)
+
+    worker = StageTimer() # e.g. shipped back from a worker process
+    with worker.stage("parse"):
+        pass
+    worker.count("rows_written", 2)
+    timer.merge(worker.as_dict())
+
+    timings = timer.as_dict()
+    assert timings['calls'] == {'parse': 4, 'write': 1}
+    assert timings['seconds']['parse'] >= worker.as_dict()['seconds']['parse'] > 0
+    assert timings['counters'] == {'rows_written': 7}
+    assert list(timer.report()['stages']) == sorted(timings['seconds'], key=lambda name: -timings['seconds'][name])
+
+def test_worker_job_reports_its_stages(tmp_path):
+    random.seed(1)
+    generate_random_data(tmp_path, 1)
+    patient = patient_paths(tmp_path)[0]
+    fractions = [(fx_path, processing.list_fields(fx_path), None) for fx_path in processing.list_fractions(patient)]
+    rows, timings, _ = analyze_fractions("Breathing", patient, fractions)
+    assert timings['calls']['metrics'] == 1
+    assert timings['counters']['fractions'] == len(rows) == len(fractions)
+
+def test_timed_without_timer_is_a_no_op():
+    with timed(None, "parse"):
+        pass
+
+def test_profiling_disabled_is_a_no_op(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESPIRATION_LOG_DIR", str(tmp_path / "logs"))
+    monkeypatch.delenv("RESPIRATION_PROFILE", raising=False)
+    with profiling() as result:
+        pass
+    assert result == dict() and not (tmp_path / "logs").exists()
+
+def test_run_records_timings_without_profiling(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESPIRATION_LOG_DIR", str(tmp_path / "logs"))
+    monkeypatch.delenv("RESPIRATION_PROFILE", raising=False)
+    random.seed(1)
+    generate_random_data(tmp_path / "data", 2)
+    summary = pipeline.run_analysis(tmp_path / "data", [CsvSink(tmp_path / "out.csv")], max_workers=1,
+                                    cache_dir=tmp_path / "cache", status_callback=lambda message: None)
+
+    assert {"metrics", "write"} <= set(summary['timing']['stages'])
+    assert summary['timing']['counters']['fractions'] == 8 and 'profile_path' not in summary
+    assert [path.name for path in (tmp_path / "logs").iterdir()] == ["timings.jsonl"] # No profile written
+    log_lines = (tmp_path / "logs" / "timings.jsonl").read_text().splitlines()
+    assert len(log_lines) == 1 and json.loads(log_lines[0])['stages'] == summary['timing']['stages']
+
+@pytest.mark.parametrize("mode", instrumentation.PROFILE_MODES)
+def test_profiling_writes_profile(tmp_path, monkeypatch, mode):
+    monkeypatch.setenv("RESPIRATION_LOG_DIR", str(tmp_path))
+    with profiling(mode) as result:
+        sum(range(1000))
+    assert result['profile_path'].startswith(str(tmp_path)) and (tmp_path / result['profile_path']).stat().st_size > 0
+
+def test_unknown_profile_mode_is_rejected():
+    with pytest.raises(ValueError):
+        with profiling("perf"):
+            pass
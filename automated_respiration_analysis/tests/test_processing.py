@@ -0,0 +1,59 @@
+import random
+
+from app import dataloader, processing
+from app.data_generator import generate_archive, generate_random_data
+from tests import baseline
+
+def patient_paths(data_root):
+    return [patient for patients in dataloader.patient_listing(data_root).values() for patient in patients]
+
+def assert_same_results(results, ref_results):
+    assert results.keys() == ref_results.keys()
+    for patient_id, fractions in ref_results.items():
+        assert results[patient_id].keys() == fractions.keys()
+        for fx_idx, ref_metrics in fractions.items():
+            assert results[patient_id][fx_idx] == tuple(ref_metrics), (patient_id, fx_idx)
+
+def test_random_archive_matches_baseline(tmp_path):
+    random.seed(7) # Includes fractions whose closed-form error metrics round differently from np.polyfit
+    generate_random_data(tmp_path, 60)
+    patients = patient_paths(tmp_path)
+    assert_same_results(processing.batch_processing(patients), baseline.batch_processing(patients))
+
+def test_polyfit_fallback_matches_baseline(tmp_path, monkeypatch):
+    # Every fraction counts as close to a rounding boundary: all interval errors come from np.polyfit
+    monkeypatch.setattr(processing, "CLOSED_FORM_TOLERANCE", float("inf"))
+    random.seed(2)
+    generate_random_data(tmp_path, 4)
+    patients = patient_paths(tmp_path)
+    assert_same_results(processing.batch_processing(patients), baseline.batch_processing(patients))
+
+def test_breathing_archive_matches_baseline(tmp_path):
+    generate_archive(tmp_path, 3, num_fractions=2, num_fields=3, samples_per_field=3000, seed=2)
+    patients = patient_paths(tmp_path)
+    assert_same_results(processing.batch_processing(patients), baseline.batch_processing(patients))
+
+def test_cohort_metrics_match_per_fraction_metrics(tmp_path):
+    random.seed(1)
+    generate_random_data(tmp_path, 3)
+    fractions = [(fx_path, processing.list_fields(fx_path), None)
+                 for patient in patient_paths(tmp_path) for fx_path in processing.list_fractions(patient)]
+    cohort_series = processing.load_fractions(fractions)
+    assert processing.compute_cohort_metrics(cohort_series) == [
+        processing.compute_fraction_metrics(series) for series in cohort_series]
+
+def test_enabled_intervals_match_baseline(tmp_path):
+    random.seed(3)
+    generate_random_data(tmp_path, 4)
+    fields = [field for patient in patient_paths(tmp_path) for fx_path in processing.list_fractions(patient)
+              for field in processing.list_fields(fx_path)]
+    stacked = processing.stack_intervals([[baseline.read_field_data(field)] for field in fields])
+    ref_levels = []
+    for field in fields:
+        (data_Times, data_Amps), (beam_Times, beam_States) = baseline.read_field_data(field)
+        beam_Times = baseline.beam_modification(beam_Times, beam_States)
+        intervals, count = processing.beam_enabling_intervals(data_Times, data_Amps, beam_Times)
+        ref_intervals, ref_count = baseline.beam_enabling_intervals(data_Times, data_Amps, beam_Times)
+        assert count == ref_count and all(list(intv) == list(ref) for intv, ref in zip(intervals, ref_intervals))
+        ref_levels += [baseline.avg_lvl_per_interval(intv) for intv in ref_intervals]
+    assert ref_levels and stacked['levels'].tolist() == ref_levels
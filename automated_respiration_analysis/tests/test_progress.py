@@ -0,0 +1,53 @@
+import pytest
+
+from app.progress import ProgressTracker
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def tracker(total_bytes, total_fractions, min_interval=0.1):
+    clock, reports = FakeClock(), []
+    return ProgressTracker(total_bytes, total_fractions, reports.append, min_interval, clock=clock), clock, reports
+
+def test_reports_are_throttled():
+    progress, clock, reports = tracker(1000, 10)
+    for step in range(9):
+        clock.now = step * 0.04 # 25 Hz
+        progress.advance(100)
+    # First report, then one per 0.1 s: at 0.0, 0.12, 0.24
+    assert [report['done_fractions'] for report in reports] == [1, 4, 7]
+
+    clock.now = 0.33 # Too soon, but the final report is never dropped
+    progress.advance(100)
+    assert reports[-1]['done_fractions'] == 10 and reports[-1]['percent'] == 100
+    assert reports[-1]['eta_seconds'] == 0.0
+
+def test_eta_follows_throughput():
+    progress, clock, reports = tracker(1000, 4)
+    assert progress.snapshot()['eta_seconds'] is None # Nothing measurable yet
+
+    clock.now = 2.0
+    progress.advance(250)
+    assert reports[-1]['percent'] == 25
+    assert reports[-1]['bytes_per_second'] == pytest.approx(125.0)
+    assert reports[-1]['eta_seconds'] == pytest.approx(6.0) # 25% in 2 s: 75% in 6 s
+
+    clock.now = 4.0
+    progress.advance(500)
+    assert reports[-1]['percent'] == 75
+    assert reports[-1]['eta_seconds'] == pytest.approx(4.0 / 3)
+
+def test_progress_without_bytes_counts_fractions():
+    progress, clock, reports = tracker(0, 4)
+    clock.now = 1.0
+    progress.advance(0)
+    assert reports[-1]['percent'] == 25 and reports[-1]['eta_seconds'] == pytest.approx(3.0)
+
+def test_empty_run_is_complete():
+    progress, clock, reports = tracker(0, 0)
+    progress.advance(0, 0)
+    assert reports == [progress.snapshot()] and reports[0]['percent'] == 100 and reports[0]['eta_seconds'] == 0.0
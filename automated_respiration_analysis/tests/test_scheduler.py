@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+from PyQt5.QtCore import QCoreApplication, QRunnable
+
+from app import scheduler
+from app.analyze import AnalysisWorker
+
+class FakeWorker(QRunnable):
+    """AnalysisWorker stand-in: runs until released (finished) or cancelled"""
+    Signals = AnalysisWorker.Signals
+
+    def __init__(self, data_root, db_config, **worker_kwargs):
+        super().__init__()
+        self.signals = self.Signals()
+        self.cancel_event, self.release = threading.Event(), threading.Event()
+        self.ran = False
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        self.ran = True
+        self.signals.started.emit()
+        while not self.release.wait(0.01):
+            if self.cancel_event.is_set():
+                self.signals.cancelled.emit()
+                return
+        self.signals.finished.emit()
+
+@pytest.fixture
+def job_scheduler(monkeypatch):
+    app = QCoreApplication.instance() or QCoreApplication([])
+    monkeypatch.setattr(scheduler, "AnalysisWorker", FakeWorker)
+    job_scheduler = scheduler.JobScheduler(max_concurrent=1)
+    yield job_scheduler
+    job_scheduler.cancel_all()
+    job_scheduler.wait()
+    app.processEvents()
+
+def process_events_until(condition, timeout=5.0):
+    """Worker signals reach the scheduler through the event loop"""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        QCoreApplication.processEvents()
+        time.sleep(0.01)
+    return condition()
+
+def test_queued_job_taken_back_never_runs(job_scheduler):
+    running = job_scheduler.submit("a", {})
+    queued = job_scheduler.submit("b", {})
+    assert process_events_until(lambda: running.state == "running")
+
+    job_scheduler.cancel(queued.job_id)
+    assert queued.state == "cancelled" and not queued.worker.cancel_event.is_set() # Taken out of the queue
+
+    running.worker.release.set()
+    assert job_scheduler.wait(5000)
+    assert process_events_until(lambda: running.state == "finished")
+    assert not queued.worker.ran and queued.state == "cancelled"
+
+def test_running_job_is_cancelled(job_scheduler):
+    job = job_scheduler.submit("a", {})
+    assert process_events_until(lambda: job.state == "running")
+
+    job_scheduler.cancel(job.job_id)
+    assert job.state == "cancelling" and job.worker.cancel_event.is_set()
+    assert process_events_until(lambda: job.state == "cancelled")
+    assert job.ended_at is not None and job_scheduler.active_jobs() == []
+
+@pytest.mark.parametrize("cpu_count, max_concurrent, workers", [(8, 1, 8), (8, 3, 2), (2, 4, 1), (None, 1, 1)])
+def test_cores_are_shared_between_concurrent_jobs(monkeypatch, cpu_count, max_concurrent, workers):
+    QCoreApplication.instance() or QCoreApplication([])
+    monkeypatch.setattr(scheduler.os, "cpu_count", lambda: cpu_count)
+    assert scheduler.JobScheduler(max_concurrent=max_concurrent).workers_per_job() == workers
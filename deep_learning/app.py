@@ -1,48 +1,200 @@
 import torch
-import torch.nn as nn
 from flask import Flask, request, jsonify
-from PIL import Image
-from torchvision import transforms
-import io
+import os
+import threading
+import time
 
-from models.mlp import MLP
-
-# Flask 앱 초기화
-app = Flask(__name__)
+from utils.batching import MicroBatcher
+from utils.cache import PredictionCache
+from utils.export_utils import default_model_path, load_model
+from utils.preprocessing import TooManyImagesError, decode_array, decode_images, normalize
 
 device = torch.device("cpu") # Server 환경에 맞춰 CPU 사용
 
-model = MLP(input_dim=784, hidden_dim=256, num_classes=10).to(device) 
-model.load_state_dict(torch.load('./model_params/mlp_mnist.pth', map_location=device))
-model.eval()
+# 서빙할 model 형식: eager (state_dict) / torchscript / quantized (int8), main.py가 export한 파일을 load
+MODEL_VARIANT = os.getenv("MODEL_VARIANT", "eager")
+MODEL_PATH = os.getenv("MODEL_PATH") # 없으면 MODEL_VARIANT의 기본 파일 (utils/export_utils.py)
+
+# 동시 요청을 모아 한 번에 추론하는 micro-batching
+# BATCH_WINDOW_MS 동안 또는 MAX_BATCH_SIZE개가 모일 때까지 대기 (MAX_BATCH_SIZE=1이면 요청마다 바로 추론)
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "2"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "64"))
+MAX_IMAGES_PER_REQUEST = int(os.getenv("MAX_IMAGES_PER_REQUEST", "10000")) # /predict_batch 한 요청당 최대 이미지 수
 
-preprocess = transforms.Compose([
-        transforms.ToTensor(),
-        transforms.Normalize((0.5,), (0.5,))
-    ])
+# 같은 이미지가 반복해서 들어오면 /predict 결과를 재사용 (CACHE_MAX_ENTRIES=0이면 사용 안 함)
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "100000"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "3600"))
+# Model 파일이 바뀌었는지 확인하는 주기 (바뀌면 다시 load하고 cache를 비움, 0이면 확인 안 함)
+MODEL_CHECK_SECONDS = float(os.getenv("MODEL_CHECK_SECONDS", "2"))
 
-# 예측 API 엔드포인트
-@app.route('/predict', methods=['POST'])
-def predict():
-    if 'image' not in request.files:
-        return jsonify({'error': 'No image file provided'}), 400
+def configure_threads():
+    """
+    Worker 하나가 쓰는 intra-op thread 수 (TORCH_NUM_THREADS, 없으면 torch 기본값 = 전체 core 수).
+    여러 worker process로 실행할 때는 core 수 / worker 수로 맞춰야 서로 core를 두고 경쟁하지 않는다 (gunicorn.conf.py 참고)
+    """
+    num_threads = int(os.getenv("TORCH_NUM_THREADS", "0"))
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    return torch.get_num_threads()
 
-    image_file = request.files['image']
+def weights_fingerprint(path):
+    """Model 파일의 (mtime, size), 파일이 없으면 None"""
     try:
-        image = Image.open(io.BytesIO(image_file.read()))
-        image_tensor = preprocess(image).unsqueeze(0)
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def create_app(model_path=MODEL_PATH, model_variant=MODEL_VARIANT):
+    """
+    Flask 앱 생성. Model과 micro-batching thread는 process마다 하나씩 만들어진다
+    (gunicorn은 fork한 worker 안에서 이 함수를 호출하므로 worker마다 model을 한 번 load한다)
+    """
+    # Flask 앱 초기화
+    app = Flask(__name__)
+
+    num_threads = configure_threads()
+    model = load_model(model_variant, model_path, device)
+    model_path = model_path or default_model_path(model_variant)
+    weights = weights_fingerprint(model_path)
+    batcher = MicroBatcher(model, max_batch_size=MAX_BATCH_SIZE, max_wait=BATCH_WINDOW_MS / 1000) if MAX_BATCH_SIZE > 1 else None
+    cache = PredictionCache(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS) if CACHE_MAX_ENTRIES > 0 else None
+    reload_lock = threading.Lock()
+    last_check = time.monotonic()
+
+    def check_weights():
+        """Model 파일이 바뀌었으면 (MODEL_CHECK_SECONDS마다 확인) 다시 load하고 예측 cache를 비운다"""
+        nonlocal model, weights, last_check
+        if MODEL_CHECK_SECONDS <= 0 or time.monotonic() - last_check < MODEL_CHECK_SECONDS:
+            return
+        with reload_lock:
+            if time.monotonic() - last_check < MODEL_CHECK_SECONDS: # 다른 thread가 방금 확인함
+                return
+            last_check = time.monotonic()
+            current = weights_fingerprint(model_path)
+            if current is None or current == weights:
+                return
+            try:
+                new_model = load_model(model_variant, model_path, device)
+            except Exception as e: # 파일을 쓰는 중일 수 있음: 다음 확인 때 다시 시도
+                print(f"Failed to reload {model_path}: {e}")
+                return
+            model = new_model
+            if batcher is not None:
+                batcher.model = new_model
+            weights = current
+            if cache is not None:
+                cache.invalidate()
+            print(f"Reloaded model weights from {model_path}")
+
+    def infer(inputs):
+        """(N, 784) 입력의 logits (batcher가 있으면 다른 요청과 함께 batch로 처리)"""
+        if batcher is not None:
+            return batcher.predict(inputs)
+        with torch.inference_mode():
+            return model(inputs)
+
+    # 예측 API 엔드포인트
+    @app.route('/predict', methods=['POST'])
+    def predict():
+        if 'image' not in request.files:
+            return jsonify({'error': 'No image file provided'}), 400
+
+        image_file = request.files['image']
+        try:
+            check_weights()
+            data = image_file.read()
+            if cache is not None:
+                key, generation = PredictionCache.key(data), cache.generation
+                result = cache.get(key)
+                if result is not None:
+                    return jsonify({'prediction': result})
+
+            try:
+                pixels = decode_images([data]) # /predict_batch와 같은 전처리 (흑백 변환, 28x28 확인)
+            except (ValueError, OSError) as e: # OSError: PIL이 읽을 수 없는 이미지
+                return jsonify({'error': str(e)}), 400
 
-        with torch.no_grad():
-            output = model(image_tensor)
-            _, predicted = torch.max(output.data, 1)
+            output = infer(normalize(pixels))
+            _, predicted = torch.max(output, 1)
             result = predicted.item()
 
-        return jsonify({'prediction': result})
+            if cache is not None:
+                cache.put(key, result, generation)
+            return jsonify({'prediction': result})
+
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    # 여러 이미지를 한 번에 예측하는 API 엔드포인트
+    # 입력: multipart 'images' 파일 목록, 또는 N x 28 x 28 uint8 배열 ('array' 파일 혹은 request body, raw bytes/NPY)
+    # 옵션: probabilities=1 (클래스별 확률), top_k=k (상위 k개 클래스와 확률)
+    @app.route('/predict_batch', methods=['POST'])
+    def predict_batch():
+        check_weights()
+        try:
+            # 이미지 수는 decode 전에 확인 (파일 개수, NPY header 또는 raw bytes 길이)
+            if 'images' in request.files:
+                image_files = request.files.getlist('images')
+                if len(image_files) > MAX_IMAGES_PER_REQUEST:
+                    raise TooManyImagesError(MAX_IMAGES_PER_REQUEST)
+                pixels = decode_images([image_file.read() for image_file in image_files])
+            elif 'array' in request.files:
+                pixels = decode_array(request.files['array'].read(), max_images=MAX_IMAGES_PER_REQUEST)
+            else:
+                pixels = decode_array(request.get_data(), max_images=MAX_IMAGES_PER_REQUEST)
+            with_probabilities = request.values.get('probabilities', '0').lower() in ('1', 'true')
+            top_k = int(request.values.get('top_k', '0'))
+            if not 0 <= top_k <= 10:
+                raise ValueError("top_k must be between 0 and 10")
+        except TooManyImagesError as e:
+            return jsonify({'error': str(e)}), 413
+        except (ValueError, OSError) as e: # OSError: PIL이 읽을 수 없는 이미지
+            return jsonify({'error': str(e)}), 400
+
+        if len(pixels) == 0:
+            return jsonify({'error': 'No images provided'}), 400
+
+        try:
+            output = infer(normalize(pixels))
+            response = {'predictions': output.argmax(1).tolist()}
+            if with_probabilities or top_k:
+                probabilities = torch.softmax(output, 1)
+                if with_probabilities:
+                    response['probabilities'] = probabilities.tolist()
+                if top_k:
+                    top_probabilities, top_labels = probabilities.topk(top_k, 1)
+                    response['top_k'] = [{'labels': labels, 'probabilities': probs}
+                                         for labels, probs in zip(top_labels.tolist(), top_probabilities.tolist())]
+            return jsonify(response)
+
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    # Micro-batching 지표 (queue 길이, batch 크기, latency 분위수)와 예측 cache 지표 (hit/miss/eviction)
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        report = {'batching': batcher is not None, 'pid': os.getpid(), 'cache': cache.stats() if cache is not None else None}
+        if batcher is not None:
+            report.update({'max_batch_size': MAX_BATCH_SIZE, 'batch_window_ms': BATCH_WINDOW_MS, **batcher.metrics()})
+        return jsonify(report)
+
+    # Liveness: process가 요청을 처리할 수 있는지
+    @app.route('/healthz', methods=['GET'])
+    def healthz():
+        return jsonify({'status': 'ok'})
+
+    # Readiness: model이 load되었고 추론 thread가 살아 있는지 (아니면 503)
+    @app.route('/readyz', methods=['GET'])
+    def readyz():
+        ready = batcher is None or batcher.thread.is_alive()
+        return jsonify({'ready': ready, 'pid': os.getpid(), 'model_variant': model_variant, 'model_path': model_path,
+                        'torch_threads': num_threads, 'batching': batcher is not None}), 200 if ready else 503
 
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return app
 
 if __name__ == '__main__':
     # debug=True는 개발용
-    # 배포 시에는 False로 설정.
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    # 배포 시에는 gunicorn으로 실행 (gunicorn.conf.py 참고):
+    #   gunicorn -c gunicorn.conf.py "app:create_app()"
+    create_app().run(debug=True, port=5000)
@@ -0,0 +1,112 @@
+"""
+/predict 부하 테스트: 여러 thread에서 동시에 요청을 보내 처리량(req/s)과 latency를 측정한다.
+
+Micro-batching 효과 비교 (서버를 각각 실행한 뒤 같은 부하를 준다, 요청마다 다른 이미지라 예측 cache는 hit되지 않음):
+    CACHE_MAX_ENTRIES=0 MAX_BATCH_SIZE=1 python app.py      # 요청마다 추론
+    python benchmark_load.py --concurrency 32 --requests 4000
+    CACHE_MAX_ENTRIES=0 python app.py                       # micro-batching (기본값: 64개 / 2 ms)
+    python benchmark_load.py --concurrency 32 --requests 4000
+
+예측 cache 효과 (같은 이미지 --images개를 반복해서 보낸다, warmup 이후에는 모두 cache hit):
+    python app.py
+    python benchmark_load.py --scenario repeat --images 64 --concurrency 32 --requests 4000
+"""
+import argparse
+import io
+import json
+import threading
+import time
+import urllib.request
+import uuid
+
+import numpy as np
+from PIL import Image
+
+from utils.batching import percentiles
+
+def random_digit_png(rng):
+    image = Image.fromarray(rng.integers(0, 256, size=(28, 28), dtype=np.uint8), mode='L')
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def multipart_body(png_bytes):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="digit.png"\r\n'
+            f'Content-Type: image/png\r\n\r\n').encode() + png_bytes + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+def run_load(url, bodies, num_requests, concurrency):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    counter = iter(range(num_requests))
+
+    def client():
+        while True:
+            with lock:
+                request_idx = next(counter, None)
+            if request_idx is None:
+                return
+            body, content_type = bodies[request_idx % len(bodies)]
+            request = urllib.request.Request(url, data=body, headers={'Content-Type': content_type})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                latency = time.perf_counter() - start
+                with lock:
+                    latencies.append(latency)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    return {
+        'requests': num_requests,
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'seconds': round(seconds, 3),
+        'requests_per_second': round(len(latencies) / seconds, 1),
+        'latency_ms': {name: round(value, 2) for name, value in percentiles(sorted(latencies)).items() if value is not None}
+    }
+
+def main(args):
+    rng = np.random.default_rng(0)
+    if args.scenario == "unique": # 모든 요청 (warmup 포함)이 서로 다른 이미지: cache miss만 측정
+        warmup_bodies = [multipart_body(random_digit_png(rng)) for _ in range(args.warmup)]
+        bodies = [multipart_body(random_digit_png(rng)) for _ in range(args.requests)]
+    else: # warmup이 args.images개 이미지를 cache에 넣고, 측정 구간은 같은 이미지를 반복
+        bodies = [multipart_body(random_digit_png(rng)) for _ in range(args.images)]
+        warmup_bodies = bodies
+
+    run_load(args.url + '/predict', warmup_bodies, max(args.warmup, len(warmup_bodies)), args.concurrency)
+    report = {'scenario': args.scenario, **run_load(args.url + '/predict', bodies, args.requests, args.concurrency)}
+    print(json.dumps(report, indent=2))
+
+    try:
+        with urllib.request.urlopen(args.url + '/metrics') as response:
+            print("Server metrics:", json.dumps(json.loads(response.read()), indent=2))
+    except Exception as e:
+        print(f"Could not fetch server metrics: {e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load generator for the MNIST /predict server")
+
+    parser.add_argument('--url', type=str, default='http://127.0.0.1:5000', help='Server base URL')
+    parser.add_argument('--requests', type=int, default=2000, help='Number of measured requests')
+    parser.add_argument('--warmup', type=int, default=200, help='Number of warmup requests (not measured)')
+    parser.add_argument('--concurrency', type=int, default=32, help='Number of concurrent client threads')
+    parser.add_argument('--scenario', choices=['unique', 'repeat'], default='unique',
+                        help='unique: a new image per request (no cache hits), repeat: cycle through --images images (cache hits)')
+    parser.add_argument('--images', type=int, default=64, help='Number of distinct random images to repeat (--scenario repeat)')
+
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,101 @@
+"""
+Model 형식별 (eager / torchscript / quantized) 비교: load 시간, 메모리, 추론 latency, MNIST test 정확도.
+각 형식은 별도 process에서 측정한다 (cold start와 메모리가 서로 영향을 주지 않도록).
+
+    python main.py --export_only        # model_params/에 TorchScript / int8 model 저장
+    python benchmark_variants.py
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import torch
+
+from utils.export_utils import VARIANTS, default_model_path, load_model
+from utils.preprocessing import normalize
+
+def rss_mb():
+    """현재 process의 RSS (MB, Linux에서만)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        return None
+
+def latency_ms(model, batch_size, iterations):
+    inputs = torch.randn(batch_size, 28 * 28)
+    with torch.inference_mode():
+        for _ in range(10):
+            model(inputs)
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            model(inputs)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {'p50': round(1000 * timings[len(timings) // 2], 4), 'p99': round(1000 * timings[len(timings) * 99 // 100], 4)}
+
+def measure(variant, args):
+    """한 형식의 측정 (benchmark process 안에서 실행)"""
+    torch.set_num_threads(args.threads)
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    model = load_model(variant)
+    load_seconds = time.perf_counter() - start
+    rss_after = rss_mb()
+
+    from torchvision import datasets
+
+    test_dataset = datasets.MNIST(root=args.data_path, train=False, download=True)
+    correct = 0
+    with torch.inference_mode():
+        for batch_start in range(0, len(test_dataset.data), 1000):
+            inputs = normalize(test_dataset.data[batch_start:batch_start + 1000].numpy())
+            correct += (model(inputs).argmax(1) == test_dataset.targets[batch_start:batch_start + 1000]).sum().item()
+
+    return {
+        'variant': variant,
+        'file_mb': round(os.path.getsize(default_model_path(variant)) / 1e6, 3),
+        'load_ms': round(1000 * load_seconds, 2),
+        'load_rss_mb': round(rss_after - rss_before, 2) if rss_before is not None else None,
+        'accuracy': correct / len(test_dataset.data),
+        'latency_batch_1_ms': latency_ms(model, 1, args.iterations),
+        f'latency_batch_{args.batch_size}_ms': latency_ms(model, args.batch_size, args.iterations)
+    }
+
+def main(args):
+    if args.variant:
+        print(json.dumps(measure(args.variant, args)))
+        return
+
+    reports = []
+    for variant in VARIANTS:
+        if not os.path.exists(default_model_path(variant)):
+            print(f"Skipping {variant}: {default_model_path(variant)} not found (run python main.py --export_only)")
+            continue
+        command = [sys.executable, __file__, '--variant', variant, '--data_path', args.data_path,
+                   '--threads', str(args.threads), '--batch_size', str(args.batch_size), '--iterations', str(args.iterations)]
+        reports.append(json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout.splitlines()[-1]))
+
+    baseline = next((report for report in reports if report['variant'] == "eager"), None)
+    for report in reports:
+        if baseline is not None:
+            report['accuracy_delta'] = round(report['accuracy'] - baseline['accuracy'], 4)
+        print(json.dumps(report))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare eager / TorchScript / int8 quantized MLP variants")
+
+    parser.add_argument('--data_path', type=str, default='./data', help='Path to MNIST dataset')
+    parser.add_argument('--threads', type=int, default=1, help='torch intra-op threads')
+    parser.add_argument('--batch_size', type=int, default=64, help='Batch size of the second latency measurement')
+    parser.add_argument('--iterations', type=int, default=1000, help='Timed forward passes per latency measurement')
+    parser.add_argument('--variant', choices=VARIANTS, default=None, help=argparse.SUPPRESS) # 측정 process용
+
+    args = parser.parse_args()
+
+    main(args)
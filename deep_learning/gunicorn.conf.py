@@ -0,0 +1,23 @@
+"""
+배포용 실행 설정 (CPU 서버). deep_learning/ 에서:
+
+    pip install -r requirements.txt
+    gunicorn -c gunicorn.conf.py "app:create_app()"
+
+- Worker process WEB_CONCURRENCY개 (기본값: CPU core 수), 각 worker가 model을 한 번씩 load한다.
+- Worker마다 TORCH_NUM_THREADS개의 intra-op thread (기본값: core 수 / worker 수)를 사용해 core를 나눠 쓴다.
+- Worker마다 GUNICORN_THREADS개의 요청 처리 thread가 있어, 동시 요청이 micro-batching으로 묶인다.
+- 상태 확인: GET /healthz (liveness), GET /readyz (readiness)
+"""
+import os
+
+cores = os.cpu_count() or 1
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(cores)))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = 60
+
+# Worker들이 상속하는 환경 변수: app.configure_threads()가 읽는다
+os.environ.setdefault("TORCH_NUM_THREADS", str(max(1, cores // workers)))
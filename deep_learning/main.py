@@ -7,8 +7,18 @@ from torch.utils.data import DataLoader
 
 from models.mlp import MLP
 from utils.train_utils import train_epoch, evaluate_epoch
+from utils.export_utils import default_model_path, export_model, load_model
+
+def export(model):
+    # 서빙용 TorchScript / int8 quantized model 저장 (app.py에서 MODEL_VARIANT로 선택)
+    for variant, path in export_model(model).items():
+        print(f"Exported {variant} model to {path}")
 
 def main(args):
+    if args.export_only:
+        export(load_model("eager", hidden_dim=args.hidden_dim))
+        return
+
     device = torch.device("cuda" if torch.cuda.is_available() and args.use_cuda else "cpu")
     print(f"Using device: {device}")
 
@@ -37,13 +47,15 @@ def main(args):
         print(f"Test Loss: {eval_loss:.4f}, Test Acc: {eval_acc:.4f}")
     
     print("\nTraining complete.")
-    model_save_path = "./model_params/mlp_mnist.pth"
+    model_save_path = default_model_path("eager")
     torch.save(model.state_dict(), model_save_path)
     print(f"Model saved to {model_save_path}")
 
     final_test_loss, final_test_acc = evaluate_epoch(model, test_loader, criterion, device)
     print(f"\nFinal Test Loss: {final_test_loss:.4f}, Final Test Accuracy: {final_test_acc:.4f}")
 
+    export(model)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="MNIST MLP Classifier")
 
@@ -54,6 +66,7 @@ if __name__ == "__main__":
 
     parser.add_argument('--data_path', type=str, default='./data', help='Path to MNIST dataset')
     parser.add_argument('--use_cuda', action='store_true', help='Use CUDA for training if available')
+    parser.add_argument('--export_only', action='store_true', help='Export TorchScript/quantized models from saved weights without training')
     
     args = parser.parse_args()
     
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Tests import the modules the same way app.py / main.py do (from the deep_learning directory)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
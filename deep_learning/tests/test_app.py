@@ -0,0 +1,69 @@
+import io
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+import app as serving
+from models.mlp import MLP
+from tests.test_preprocessing import torchvision_preprocess
+from utils.export_utils import load_model
+
+def png(pixels):
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def npy(pixels):
+    buffer = io.BytesIO()
+    np.save(buffer, pixels)
+    return buffer.getvalue()
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    torch.manual_seed(0)
+    model_path = tmp_path / "mlp_mnist.pth"
+    torch.save(MLP(input_dim=784, hidden_dim=256, num_classes=10).state_dict(), model_path)
+    monkeypatch.setattr(serving, "MAX_IMAGES_PER_REQUEST", 3)
+    return serving.create_app(model_path=str(model_path), model_variant="eager").test_client()
+
+@pytest.fixture
+def images():
+    return np.random.default_rng(0).integers(0, 256, size=(4, 28, 28), dtype=np.uint8)
+
+def test_batch_within_limit(client, images):
+    multipart = client.post('/predict_batch', data={'images': [(io.BytesIO(png(image)), f"{idx}.png")
+                                                               for idx, image in enumerate(images[:3])]})
+    raw = client.post('/predict_batch', data=images[:3].tobytes())
+    array = client.post('/predict_batch', data={'array': (io.BytesIO(npy(images[:3])), "images.npy")})
+    assert multipart.status_code == raw.status_code == array.status_code == 200
+    assert multipart.json['predictions'] == raw.json['predictions'] == array.json['predictions']
+    assert len(raw.json['predictions']) == 3
+
+def test_too_many_files_are_not_decoded(client, images, monkeypatch):
+    def decode_images(blobs):
+        raise AssertionError("decoded before the count check")
+    monkeypatch.setattr(serving, "decode_images", decode_images)
+    response = client.post('/predict_batch', data={'images': [(io.BytesIO(png(image)), f"{idx}.png")
+                                                              for idx, image in enumerate(images)]})
+    assert response.status_code == 413 and response.json['error'] == "At most 3 images per request"
+
+def test_too_many_raw_images(client, images):
+    assert client.post('/predict_batch', data=images.tobytes()).status_code == 413
+
+def test_npy_count_comes_from_the_header(client, images):
+    # The header announces 4 images but the data is cut short: decoding it would fail (400)
+    truncated = npy(images)[:-100]
+    assert client.post('/predict_batch', data=truncated).status_code == 413
+    assert client.post('/predict_batch', data={'array': (io.BytesIO(truncated), "images.npy")}).status_code == 413
+    assert client.post('/predict_batch', data=npy(images[:3])[:-100]).status_code == 400
+
+def test_predict_matches_torchvision_preprocessing(client, tmp_path):
+    model = load_model("eager", str(tmp_path / "mlp_mnist.pth"))
+    images = np.random.default_rng(1).integers(0, 256, size=(50, 28, 28), dtype=np.uint8)
+    for image in images:
+        response = client.post('/predict', data={'image': (io.BytesIO(png(image)), "digit.png")})
+        with torch.no_grad():
+            expected = model(torchvision_preprocess(Image.fromarray(image)).unsqueeze(0)).argmax(1).item()
+        assert response.json == {'prediction': expected}
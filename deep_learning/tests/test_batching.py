@@ -0,0 +1,74 @@
+import time
+
+import pytest
+import torch
+
+from utils.batching import MicroBatcher, percentiles
+
+class RecordingModel:
+    """Doubles its inputs and records the size of every batch; fails while `error` is set"""
+    def __init__(self):
+        self.batches, self.error = [], None
+
+    def __call__(self, inputs):
+        self.batches.append(len(inputs))
+        if self.error is not None:
+            raise self.error
+        return inputs * 2
+
+@pytest.fixture
+def model():
+    return RecordingModel()
+
+def test_full_batch_is_flushed_without_waiting(model):
+    batcher = MicroBatcher(model, max_batch_size=4, max_wait=10)
+    start = time.perf_counter()
+    futures = [batcher.submit(torch.full((1, 1), float(idx))) for idx in range(4)]
+    assert [future.result(5).item() for future in futures] == [0.0, 2.0, 4.0, 6.0]
+    assert time.perf_counter() - start < 5 and model.batches == [4]
+    batcher.close()
+
+def test_partial_batch_is_flushed_after_max_wait(model):
+    batcher = MicroBatcher(model, max_batch_size=64, max_wait=0.2)
+    start = time.perf_counter()
+    futures = [batcher.submit(torch.ones(1, 1)) for _ in range(3)]
+    for future in futures:
+        future.result(5)
+    assert time.perf_counter() - start >= 0.15 and model.batches == [3]
+    batcher.close()
+
+def test_results_are_routed_to_each_caller(model):
+    batcher = MicroBatcher(model, max_batch_size=64, max_wait=0.05)
+    requests = [torch.arange(rows * 2, dtype=torch.float32).reshape(rows, 2) + 100 * rows for rows in (1, 3, 2)]
+    futures = [batcher.submit(inputs) for inputs in requests]
+    for inputs, future in zip(requests, futures):
+        assert torch.equal(future.result(5), inputs * 2)
+    assert sum(model.batches) == 6
+    batcher.close()
+
+def test_exception_reaches_every_waiter(model):
+    batcher = MicroBatcher(model, max_batch_size=3, max_wait=10)
+    model.error = RuntimeError("out of memory")
+    futures = [batcher.submit(torch.ones(1, 1)) for _ in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="out of memory"):
+            future.result(5)
+    assert batcher.metrics()['errors'] == 3
+
+    model.error = None # The batcher keeps serving after a failed batch
+    assert batcher.predict(torch.ones(3, 1), timeout=5).tolist() == [[2.0]] * 3
+    batcher.close()
+    assert not batcher.thread.is_alive()
+
+def test_metrics(model):
+    batcher = MicroBatcher(model, max_batch_size=2, max_wait=10)
+    for future in [batcher.submit(torch.ones(1, 1)) for _ in range(4)]:
+        future.result(5)
+    report = batcher.metrics()
+    assert (report['batches'], report['items'], report['batch_sizes'], report['mean_batch_size']) == (2, 4, {2: 2}, 2.0)
+    assert report['latency_ms']['p50'] is not None
+    batcher.close()
+
+def test_percentiles():
+    assert percentiles([]) == {'p50': None, 'p95': None, 'p99': None}
+    assert percentiles([i / 1000 for i in range(100)]) == pytest.approx({'p50': 50.0, 'p95': 95.0, 'p99': 99.0})
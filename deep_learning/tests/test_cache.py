@@ -0,0 +1,46 @@
+from utils.cache import PredictionCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_entries=2)
+    cache.put(b"a", 1, cache.generation)
+    cache.put(b"b", 2, cache.generation)
+    assert cache.get(b"a") == 1 # b is now the least recently used
+    cache.put(b"c", 3, cache.generation)
+    assert (cache.get(b"a"), cache.get(b"b"), cache.get(b"c")) == (1, None, 3)
+    cache.put(b"d", 4, cache.generation) # a was used before c
+    assert list(cache.entries) == [b"c", b"d"]
+    assert cache.stats()['evictions'] == 2
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = PredictionCache(ttl=10, clock=clock)
+    cache.put(b"a", 1, cache.generation)
+    clock.now = 10.0
+    assert cache.get(b"a") == 1 # Hits do not extend the lifetime
+    clock.now = 10.5
+    assert cache.get(b"a") is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations'], stats['entries']) == (1, 1, 1, 0)
+
+def test_invalidate_drops_entries_and_late_results():
+    cache = PredictionCache()
+    cache.put(b"a", 1, cache.generation)
+    generation = cache.generation # Read before an inference that races with a model reload
+    cache.invalidate()
+    cache.put(b"b", 2, generation)
+    assert cache.get(b"a") is None and cache.get(b"b") is None
+    cache.put(b"b", 2, cache.generation)
+    assert cache.get(b"b") == 2 and cache.stats()['invalidations'] == 1
+
+def test_key_depends_on_content_only():
+    key = PredictionCache.key(b"\x89PNG image")
+    assert key == PredictionCache.key(bytearray(b"\x89PNG image")) == PredictionCache.key(b"\x89PNG " + b"image")
+    assert key == bytes.fromhex("ed9b7a2193baeda5ad77f95a38458965") # Same across processes and restarts
+    assert key != PredictionCache.key(b"\x89PNG image ") and key != PredictionCache.key(b"")
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+import torch
+
+from models.mlp import MLP
+from utils.export_utils import MODEL_FILES, export_model, load_model
+from utils.preprocessing import normalize
+
+@pytest.fixture(scope="module")
+def exported(tmp_path_factory):
+    torch.manual_seed(0)
+    model = MLP(input_dim=784, hidden_dim=256, num_classes=10).eval()
+    model_dir = tmp_path_factory.mktemp("model_params")
+    torch.save(model.state_dict(), model_dir / MODEL_FILES["eager"])
+    return model_dir, export_model(model, str(model_dir))
+
+@pytest.fixture(scope="module")
+def inputs():
+    return normalize(np.random.default_rng(0).integers(0, 256, size=(500, 28, 28), dtype=np.uint8))
+
+def predict(variant, path, inputs):
+    with torch.inference_mode():
+        return load_model(variant, str(path))(inputs)
+
+def test_exports_are_written_to_model_dir(exported):
+    model_dir, paths = exported
+    assert paths == {variant: str(model_dir / MODEL_FILES[variant]) for variant in ("torchscript", "quantized")}
+
+def test_torchscript_matches_eager(exported, inputs):
+    model_dir, paths = exported
+    eager = predict("eager", model_dir / MODEL_FILES["eager"], inputs)
+    assert torch.allclose(predict("torchscript", paths["torchscript"], inputs), eager, atol=1e-6)
+
+def test_quantized_stays_close_to_eager(exported, inputs):
+    model_dir, paths = exported
+    eager = predict("eager", model_dir / MODEL_FILES["eager"], inputs)
+    quantized = predict("quantized", paths["quantized"], inputs)
+    assert (quantized - eager).abs().max() <= 0.05 * eager.abs().max() # int8 weights: small logit error
+    assert (quantized.argmax(1) == eager.argmax(1)).float().mean() >= 0.95
+
+def test_unknown_variant_is_rejected():
+    with pytest.raises(ValueError, match="Unknown model variant"):
+        load_model("onnx")
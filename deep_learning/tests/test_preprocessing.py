@@ -0,0 +1,46 @@
+import io
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+from torchvision import transforms
+
+from utils.preprocessing import decode_array, decode_images, normalize
+
+# /predict preprocessing before utils.preprocessing: one transforms.Compose call per image
+torchvision_preprocess = transforms.Compose([transforms.ToTensor(), transforms.Normalize((0.5,), (0.5,))])
+
+def png(pixels):
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+@pytest.fixture
+def images():
+    images = np.random.default_rng(0).integers(0, 256, size=(200, 28, 28), dtype=np.uint8)
+    images[0], images[1] = 0, 255 # Both ends of the range
+    return images
+
+def test_normalize_matches_torchvision(images):
+    blobs = [png(image) for image in images]
+    expected = torch.cat([torchvision_preprocess(Image.open(io.BytesIO(blob))).view(1, 784) for blob in blobs])
+    assert torch.equal(normalize(decode_images(blobs)), expected)
+
+def test_decode_images_converts_to_grayscale(images):
+    rgb = png(np.repeat(images[2][:, :, None], 3, axis=2))
+    assert np.array_equal(decode_images([rgb])[0], images[2])
+    with pytest.raises(ValueError, match="expected 28x28"):
+        decode_images([png(np.zeros((32, 32), dtype=np.uint8))])
+
+def test_decode_array_formats(images):
+    buffer = io.BytesIO()
+    np.save(buffer, images[:5])
+    assert np.array_equal(decode_array(buffer.getvalue()), images[:5])
+    assert np.array_equal(decode_array(images[:5].tobytes()), images[:5])
+    with pytest.raises(ValueError, match="whole number"):
+        decode_array(images[:5].tobytes()[:-1])
+    buffer = io.BytesIO()
+    np.save(buffer, images[:5].astype(np.float32))
+    with pytest.raises(ValueError, match="uint8"):
+        decode_array(buffer.getvalue())
@@ -0,0 +1,116 @@
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+
+class MicroBatcher:
+    """
+    요청마다 model을 따로 호출하지 않고, 짧은 시간(max_wait 초) 동안 또는 max_batch_size개가 모일 때까지
+    들어온 입력을 모아 한 번의 batch forward로 처리한 뒤 각 요청에 결과를 돌려준다.
+    submit()에는 (N, ...) 텐서를 넘기며, 결과로 해당 N개 행의 출력이 담긴 Future를 받는다.
+    """
+    def __init__(self, model, max_batch_size=64, max_wait=0.002, latency_window=1000):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+
+        # Metrics (최근 latency_window개 요청의 latency로 분위수 계산)
+        self.lock = threading.Lock()
+        self.latencies = collections.deque(maxlen=latency_window)
+        self.queue_waits = collections.deque(maxlen=latency_window)
+        self.batch_sizes = collections.Counter()
+        self.num_batches, self.num_items, self.num_errors = 0, 0, 0
+        self.inference_seconds = 0.0
+
+        self.thread = threading.Thread(target=self._loop, name="MicroBatcher", daemon=True)
+        self.thread.start()
+
+    def submit(self, inputs):
+        future = Future()
+        self.requests.put((inputs, future, time.perf_counter()))
+        return future
+
+    def predict(self, inputs, timeout=None):
+        return self.submit(inputs).result(timeout)
+
+    def close(self):
+        self.requests.put(None)
+        self.thread.join()
+
+    def _collect(self):
+        """첫 요청을 기다린 후, 마감 시각(첫 요청 + max_wait)까지 batch를 채운다"""
+        first = self.requests.get()
+        if first is None:
+            return None
+        batch, num_rows = [first], len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while num_rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self.requests.put(None) # 현재 batch를 처리한 뒤 종료
+                break
+            batch.append(item)
+            num_rows += len(item[0])
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        start = time.perf_counter()
+        sizes = [len(inputs) for inputs, _, _ in batch]
+        try:
+            with torch.inference_mode():
+                outputs = self.model(torch.cat([inputs for inputs, _, _ in batch]))
+            for (_, future, _), output in zip(batch, torch.split(outputs, sizes)):
+                future.set_result(output)
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            with self.lock:
+                self.num_errors += len(batch)
+        end = time.perf_counter()
+
+        with self.lock:
+            self.num_batches += 1
+            self.num_items += sum(sizes)
+            self.batch_sizes[sum(sizes)] += 1
+            self.inference_seconds += end - start
+            for _, _, submitted in batch:
+                self.queue_waits.append(start - submitted)
+                self.latencies.append(end - submitted)
+
+    def metrics(self):
+        with self.lock:
+            latencies, queue_waits = sorted(self.latencies), sorted(self.queue_waits)
+            return {
+                'queue_depth': self.requests.qsize(),
+                'batches': self.num_batches,
+                'items': self.num_items,
+                'errors': self.num_errors,
+                'mean_batch_size': self.num_items / self.num_batches if self.num_batches else 0.0,
+                'max_batch_size': max(self.batch_sizes, default=0),
+                'batch_sizes': dict(sorted(self.batch_sizes.items())),
+                'mean_inference_ms': 1000 * self.inference_seconds / self.num_batches if self.num_batches else 0.0,
+                'latency_ms': percentiles(latencies),
+                'queue_wait_ms': percentiles(queue_waits)
+            }
+
+def percentiles(sorted_seconds, points=(50, 95, 99)):
+    """정렬된 시간(초) 목록의 분위수 (ms)"""
+    if not sorted_seconds:
+        return {f"p{point}": None for point in points}
+    return {f"p{point}": 1000 * sorted_seconds[min(len(sorted_seconds) - 1, len(sorted_seconds) * point // 100)]
+            for point in points}
@@ -0,0 +1,69 @@
+import collections
+import hashlib
+import threading
+import time
+
+class PredictionCache:
+    """
+    업로드된 파일 내용(bytes)의 hash -> 예측 결과. 최대 max_entries개 (LRU로 제거), 각 항목은 ttl초 후 만료.
+    invalidate()는 전체를 비우고 generation을 올린다: 그 전에 시작된 추론 결과는 put()에서 버려진다.
+    clock: 현재 시각(초)을 반환하는 함수
+    """
+    def __init__(self, max_entries=100000, ttl=3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = collections.OrderedDict() # key -> (만료 시각, 값), 오래 사용되지 않은 순서
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.hits, self.misses, self.evictions, self.expirations, self.invalidations = 0, 0, 0, 0, 0
+
+    @staticmethod
+    def key(data):
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] < self.clock():
+                del self.entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, generation):
+        """generation: 추론 전에 읽은 self.generation (그 사이 invalidate()되었으면 저장하지 않음)"""
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.entries[key] = (self.clock() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
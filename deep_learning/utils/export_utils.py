@@ -0,0 +1,57 @@
+import copy
+import os
+
+import torch
+import torch.nn as nn
+
+# 서빙용 model 형식
+#   eager: state_dict를 MLP에 load (Python에서 module 재구성, fp32)
+#   torchscript: freeze된 TorchScript (fp32, Python module 코드 없이 load)
+#   quantized: nn.Linear weight를 int8로 dynamic quantization한 TorchScript
+VARIANTS = ("eager", "torchscript", "quantized")
+
+MODEL_DIR = "./model_params"
+MODEL_FILES = {
+    "eager": "mlp_mnist.pth",
+    "torchscript": "mlp_mnist_scripted.pt",
+    "quantized": "mlp_mnist_int8.pt"
+}
+
+def default_model_path(variant, model_dir=MODEL_DIR):
+    return os.path.join(model_dir, MODEL_FILES[variant])
+
+def export_torchscript(model, path):
+    model = copy.deepcopy(model).cpu().eval()
+    scripted = torch.jit.freeze(torch.jit.script(model))
+    scripted.save(path)
+    return path
+
+def export_quantized(model, path):
+    """nn.Linear를 dynamic int8 quantization (weight는 int8, activation은 추론 시 quantize)"""
+    model = copy.deepcopy(model).cpu().eval()
+    quantized = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    scripted = torch.jit.freeze(torch.jit.script(quantized))
+    scripted.save(path)
+    return path
+
+def export_model(model, model_dir=MODEL_DIR):
+    """TorchScript와 int8 quantized 변형을 model_dir에 저장하고 {variant: path}를 반환"""
+    return {
+        "torchscript": export_torchscript(model, default_model_path("torchscript", model_dir)),
+        "quantized": export_quantized(model, default_model_path("quantized", model_dir))
+    }
+
+def load_model(variant="eager", path=None, device=torch.device("cpu"), hidden_dim=256):
+    """서빙/벤치마크용 model load (eval mode)"""
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown model variant '{variant}', expected one of {VARIANTS}")
+    path = path or default_model_path(variant)
+    if variant == "eager":
+        from models.mlp import MLP
+
+        model = MLP(input_dim=784, hidden_dim=hidden_dim, num_classes=10).to(device)
+        model.load_state_dict(torch.load(path, map_location=device))
+    else:
+        model = torch.jit.load(path, map_location=device)
+    model.eval()
+    return model
@@ -0,0 +1,65 @@
+import io
+import math
+
+import numpy as np
+import torch
+from PIL import Image
+
+NPY_MAGIC = b'\x93NUMPY'
+
+class TooManyImagesError(ValueError):
+    """요청의 이미지 수가 max_images보다 많음 (decode 전에 확인)"""
+    def __init__(self, max_images):
+        super().__init__(f"At most {max_images} images per request")
+
+def decode_images(blobs):
+    """이미지 파일(PNG 등) bytes 목록 -> (N, 28, 28) uint8 배열"""
+    pixels = np.empty((len(blobs), 28, 28), dtype=np.uint8)
+    for idx, blob in enumerate(blobs):
+        image = Image.open(io.BytesIO(blob))
+        if image.mode != 'L':
+            image = image.convert('L')
+        if image.size != (28, 28):
+            raise ValueError(f"Image {idx} is {image.size[0]}x{image.size[1]}, expected 28x28")
+        pixels[idx] = np.asarray(image)
+    return pixels
+
+def _npy_header(data):
+    """NPY 파일의 (shape, dtype), header만 읽는다"""
+    stream = io.BytesIO(data)
+    version = np.lib.format.read_magic(stream)
+    read_header = {(1, 0): np.lib.format.read_array_header_1_0, (2, 0): np.lib.format.read_array_header_2_0}.get(version)
+    if read_header is None:
+        raise ValueError(f"Unsupported NPY format version {version[0]}.{version[1]}")
+    shape, _, dtype = read_header(stream)
+    return shape, dtype
+
+def decode_array(data, max_images=None):
+    """
+    NPY 파일 또는 raw bytes (N x 28 x 28 uint8) -> (N, 28, 28) uint8 배열.
+    이미지 수는 배열을 decode하기 전에 NPY header (raw bytes는 길이)로 확인한다: max_images보다 많으면 TooManyImagesError
+    """
+    is_npy = data.startswith(NPY_MAGIC)
+    if is_npy:
+        shape, dtype = _npy_header(data)
+        if dtype != np.uint8:
+            raise ValueError(f"Expected a uint8 array, got {dtype}")
+        if math.prod(shape) % (28 * 28):
+            raise ValueError(f"Array of shape {shape} is not a whole number of 28x28 images")
+        num_images = math.prod(shape) // (28 * 28)
+    else:
+        if len(data) % (28 * 28):
+            raise ValueError(f"Raw data of {len(data)} bytes is not a whole number of 28x28 images")
+        num_images = len(data) // (28 * 28)
+    if max_images is not None and num_images > max_images:
+        raise TooManyImagesError(max_images)
+
+    pixels = np.load(io.BytesIO(data), allow_pickle=False) if is_npy else np.frombuffer(data, dtype=np.uint8)
+    return pixels.reshape(-1, 28, 28)
+
+def normalize(pixels):
+    """
+    (N, 28, 28) uint8 -> (N, 784) float 텐서. 이미지마다 transforms.Compose를 적용하는 대신
+    ToTensor() + Normalize((0.5,), (0.5,))와 같은 연산을 batch 전체에 한 번에 적용한다 (결과는 동일)
+    """
+    return torch.from_numpy(pixels.reshape(-1, 28 * 28).astype(np.float32)).div_(255).sub_(0.5).div_(0.5)